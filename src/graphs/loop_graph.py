@@ -22,8 +22,10 @@ def fetch_batch_node(state: LoopGlobalState, config: RunnableConfig, runtime: Ru
     print(f"[循环搜索-{state.search_count + 1}] 开始批次搜索")
     print("=" * 60)
 
-    # 导入网络搜索函数
-    from tools.web_search_tool import web_search
+    # 导入搜索计划引擎
+    from tools.query_plan import get_search_plan
+    from utils.news.url_canon import canonicalize_url
+    from utils.news.title_norm import normalize_title
 
     # 导入NewsItem
     from graphs.state import NewsItem
@@ -39,117 +41,31 @@ def fetch_batch_node(state: LoopGlobalState, config: RunnableConfig, runtime: Ru
 
     news_list = []
 
-    # 定义目标新闻来源域名（与主图保持一致）
-    target_sites_batch1 = "toutiao.com|sohu.com|qq.com|163.com|ifeng.com"
-    target_sites_batch2 = "sina.com.cn|thepaper.cn|36kr.com"
-    target_sites_batch3 = "ylqx.qgyyzs.net|finance.sina.com.cn"
-
-    # 构建核心搜索词列表（与主图保持一致）
-    batch1_queries = [
-        "医疗器械公司",
-        "医疗器械产品",
-        "医疗器械技术",
-        "医美公司",
-        "医美产品",
-        "医美技术"
-    ]
-
-    batch2_queries = [
-        "医疗设备",
-        "诊断设备",
-        "激光美容",
-        "整形美容",
-        "微整形"
-    ]
-
-    batch3_queries = [
-        "IVD 体外诊断",
-        "医疗器械融资",
-        "医疗器械上市",
-        "医美融资",
-        "医美上市"
-    ]
+    # 加载声明式搜索计划（与主图共用 config/search_plan.json）
+    plan = get_search_plan()
 
     try:
-        # 分批搜索
+        # 并发执行搜索计划，结果按查询顺序合并
         all_web_items = []
         search_success_count = 0
 
-        print(f"开始批次搜索，第一批次网站: {target_sites_batch1}")
-
-        # 第一批次
-        for idx, query in enumerate(batch1_queries, 1):
-            try:
-                print(f"  [批次1-{idx}/{len(batch1_queries)}] 搜索: '{query}'")
-
-                web_items, _, _, _ = web_search(
-                    ctx=ctx,
-                    query=query,
-                    search_type="web",
-                    count=10,
-                    need_summary=True,
-                    need_content=True,
-                    sites=target_sites_batch1
-                )
-
-                print(f"    ✅ 获取到 {len(web_items)} 条新闻")
-                all_web_items.extend(web_items)
-                search_success_count += 1
-
-            except Exception as e:
-                print(f"    ❌ 搜索失败: {str(e)}")
-                continue
+        print(f"开始批次搜索，站点批次: {plan.sites_summary()}")
 
-        print(f"开始批次搜索，第二批次网站: {target_sites_batch2}")
-
-        # 第二批次
-        for idx, query in enumerate(batch2_queries, 1):
-            try:
-                print(f"  [批次2-{idx}/{len(batch2_queries)}] 搜索: '{query}'")
-
-                web_items, _, _, _ = web_search(
-                    ctx=ctx,
-                    query=query,
-                    search_type="web",
-                    count=10,
-                    need_summary=True,
-                    need_content=True,
-                    sites=target_sites_batch2
-                )
-
-                print(f"    ✅ 获取到 {len(web_items)} 条新闻")
-                all_web_items.extend(web_items)
-                search_success_count += 1
-
-            except Exception as e:
-                print(f"    ❌ 搜索失败: {str(e)}")
-                continue
+        # 第一轮之后绕过搜索缓存：缓存的结果与上一轮相同，重复搜索不会有新结果
+        search_tasks = plan.compile()
+        if state.search_count > 0:
+            for task in search_tasks:
+                task.use_cache = False
 
-        print(f"开始批次搜索，第三批次网站: {target_sites_batch3}")
-
-        # 第三批次
-        for idx, query in enumerate(batch3_queries, 1):
-            try:
-                print(f"  [批次3-{idx}/{len(batch3_queries)}] 搜索: '{query}'")
-
-                web_items, _, _, _ = web_search(
-                    ctx=ctx,
-                    query=query,
-                    search_type="web",
-                    count=10,
-                    need_summary=True,
-                    need_content=True,
-                    sites=target_sites_batch3
-                )
-
-                print(f"    ✅ 获取到 {len(web_items)} 条新闻")
-                all_web_items.extend(web_items)
-                search_success_count += 1
-
-            except Exception as e:
-                print(f"    ❌ 搜索失败: {str(e)}")
+        for result in plan.search(ctx, search_tasks):
+            if not result.ok:
+                print(f"  [{result.task.label}] 搜索: '{result.task.query}' ❌ 搜索失败: {str(result.error)}")
                 continue
 
+            print(f"  [{result.task.label}] 搜索: '{result.task.query}' ✅ 获取到 {len(result.web_items)} 条新闻")
+            all_web_items.extend(result.web_items)
+            search_success_count += 1
+
         print(f"\n批次搜索完成: 成功 {search_success_count} 个查询，原始 {len(all_web_items)} 条")
 
         # 转换为NewsItem格式
@@ -169,7 +85,8 @@ def fetch_batch_node(state: LoopGlobalState, config: RunnableConfig, runtime: Ru
             news_item = NewsItem(
                 title=item.Title or "",
                 date=publish_date,
-                url=item.Url,
+                url=canonicalize_url(item.Url),
+                original_url=item.Url,
                 summary=item.Snippet or "",
                 content=item.Content or "",
                 keywords=[]
@@ -187,10 +104,7 @@ def fetch_batch_node(state: LoopGlobalState, config: RunnableConfig, runtime: Ru
         seen_titles = set()
         final_news = []
         for news in unique_by_url:
-            normalized_title = news.title.lower().strip()
-            for suffix in ['| toutiao', '- 今日头条', '_头条', '_新闻', '_资讯']:
-                normalized_title = normalized_title.replace(suffix.lower(), '')
-
+            normalized_title = normalize_title(news.title)
             if normalized_title not in seen_titles:
                 seen_titles.add(normalized_title)
                 final_news.append(news)
@@ -213,6 +127,8 @@ def deduplicate_batch_node(state: LoopGlobalState, config: RunnableConfig, runti
     title: 批次去重
     desc: 将当前批次的新闻与累积列表去重，避免重复
     """
+    from utils.news.title_norm import normalize_title
+
     print("=" * 60)
     print(f"[循环搜索-{state.search_count + 1}] 批次去重")
     print(f"  当前批次: {len(state.current_batch_news)} 条")
@@ -221,7 +137,7 @@ def deduplicate_batch_node(state: LoopGlobalState, config: RunnableConfig, runti
 
     # 获取累积列表中的URL和标题
     accumulated_urls = {news.url for news in state.accumulated_news}
-    accumulated_titles = {news.title for news in state.accumulated_news}
+    accumulated_titles = {normalize_title(news.title) for news in state.accumulated_news}
 
     deduplicated_news = []
     duplicate_count = 0
@@ -234,7 +150,7 @@ def deduplicate_batch_node(state: LoopGlobalState, config: RunnableConfig, runti
             continue
 
         # 检查标题是否已存在
-        if news.title in accumulated_titles:
+        if normalize_title(news.title) in accumulated_titles:
             duplicate_count += 1
             print(f"  标题重复，跳过: {news.title[:50]}...")
             continue
@@ -256,8 +172,6 @@ def accumulate_node(state: LoopGlobalState, config: RunnableConfig, runtime: Run
     title: 累积新闻
     desc: 将去重后的当前批次新闻累积到总列表，并更新搜索次数
     """
-    import time
-
     print("=" * 60)
     print(f"[循环搜索-{state.search_count + 1}] 累积新闻")
     print(f"  新增: {len(state.current_batch_news)} 条")
@@ -271,13 +185,13 @@ def accumulate_node(state: LoopGlobalState, config: RunnableConfig, runtime: Run
     print(f"  搜索次数: {new_search_count}")
     print("=" * 60)
 
-    # 检查是否需要继续搜索，如果需要则等待30秒
-    if len(new_accumulated) < state.target_count and new_search_count < state.max_searches:
-        print(f"\n⏳ 等待30秒后继续下一次搜索...")
+    # 检查是否需要继续搜索；请求速率由进程级搜索限流器控制，无需固定等待
+    if not state.current_batch_news:
+        print(f"\n⚠️ 本轮没有新增新闻，停止搜索")
+    elif len(new_accumulated) < state.target_count and new_search_count < state.max_searches:
+        print(f"\n⏳ 继续下一次搜索（请求速率由搜索限流器控制）")
         print(f"   当前进度: {len(new_accumulated)}/{state.target_count} 条")
         print(f"   搜索进度: {new_search_count}/{state.max_searches} 次")
-        time.sleep(30)
-        print(f"✅ 等待结束，开始下一次搜索\n")
 
     # 返回更新后的状态
     return {
@@ -306,6 +220,11 @@ def check_threshold(state: LoopGlobalState) -> str:
     if current_count >= target:
         print(f"✅ 已达到目标数量 ({current_count} >= {target})")
         return "达到目标"
+    elif not state.current_batch_news:
+        # 没有固定等待，紧接着的下一轮搜索同样不会有新结果
+        print(f"⚠️ 本轮没有新增新闻，停止搜索")
+        print(f"   当前数量: {current_count}, 目标数量: {target}")
+        return "无新结果"
     elif state.search_count >= max_searches:
         print(f"⚠️ 已达到最大搜索次数 ({state.search_count} >= {max_searches})")
         print(f"   当前数量: {current_count}, 目标数量: {target}")
@@ -337,7 +256,8 @@ builder.add_conditional_edges(
     path_map={
         "继续搜索": "fetch_batch",
         "达到目标": END,
-        "达到最大次数": END
+        "达到最大次数": END,
+        "无新结果": END
     }
 )
 
@@ -17,7 +17,7 @@ import os
 from datetime import datetime, timedelta
 from cozeloop.decorator import observe
 import json
-from jinja2 import Template
+from typing import Dict, List, Tuple
 
 
 def split_emails_node(state: SplitEmailsInput, config: RunnableConfig, runtime: Runtime[Context]) -> SplitEmailsOutput:
@@ -46,8 +46,10 @@ def fetch_news_node(state: FetchNewsInput, config: RunnableConfig, runtime: Runt
     print("开始执行 fetch_news_node - 获取新闻")
     print("=" * 60)
     
-    # 导入网络搜索函数
-    from tools.web_search_tool import web_search
+    # 导入搜索计划引擎
+    from tools.query_plan import get_search_plan
+    from utils.news.url_canon import canonicalize_url
+    from utils.news.title_norm import normalize_title
     
     # 检查环境变量
     api_key = os.getenv("COZE_WORKLOAD_IDENTITY_API_KEY")
@@ -66,141 +68,35 @@ def fetch_news_node(state: FetchNewsInput, config: RunnableConfig, runtime: Runt
     
     news_list = []
     
-    # 定义目标新闻来源域名（原有 + 新增）
-    # 注意：搜索API限制最多5个域名，这里分批搜索
-    target_sites_batch1 = "toutiao.com|sohu.com|qq.com|163.com|ifeng.com"
-    target_sites_batch2 = "sina.com.cn|thepaper.cn|36kr.com"
-    target_sites_batch3 = "ylqx.qgyyzs.net|finance.sina.com.cn"
-    
-    # 构建核心搜索词列表（确保获取的新闻主体内容与医疗器械、医美相关）
-    # 第一批次查询（对应原有5个网站）
-    batch1_queries = [
-        "医疗器械公司",
-        "医疗器械产品",
-        "医疗器械技术",
-        "医美公司",
-        "医美产品",
-        "医美技术"
-    ]
-    
-    # 第二批次查询（对应新浪、澎湃网、36氪）
-    batch2_queries = [
-        "医疗设备",
-        "诊断设备",
-        "激光美容",
-        "整形美容",
-        "微整形"
-    ]
-    
-    # 第三批次查询（对应环球医疗器械网、新浪财经）
-    batch3_queries = [
-        "IVD 体外诊断",
-        "医疗器械融资",
-        "医疗器械上市",
-        "医美融资",
-        "医美上市"
-    ]
+    # 加载声明式搜索计划（config/search_plan.json），站点批次与搜索词与主流程共用
+    plan = get_search_plan()
     
     try:
-        # 分批搜索，每批对应不同的网站
+        # 并发执行搜索计划，结果按查询顺序合并
         all_web_items = []
         search_success_count = 0
         search_fail_count = 0
         
-        print(f"开始搜索新闻，第一批次网站: {target_sites_batch1}")
-        
-        # 第一批次：原有5个网站
-        for idx, query in enumerate(batch1_queries, 1):
-            try:
-                print(f"\n[批次1-{idx}/{len(batch1_queries)}] 开始搜索: '{query}'")
-                print(f"  目标网站: {target_sites_batch1}")
-                
-                web_items, _, _, _ = web_search(
-                    ctx=ctx,
-                    query=query,
-                    search_type="web",
-                    count=10,
-                    need_summary=True,
-                    need_content=True,
-                    sites=target_sites_batch1
-                )
-                
-                print(f"  ✅ 成功获取到 {len(web_items)} 条新闻")
-                for item in web_items[:3]:  # 只打印前3条，避免日志过长
-                    print(f"     - {item.Title[:50]}...")
-                if len(web_items) > 3:
-                    print(f"     ... 还有 {len(web_items)-3} 条")
-                
-                all_web_items.extend(web_items)
-                search_success_count += 1
-                
-            except Exception as e:
-                search_fail_count += 1
-                print(f"  ❌ 搜索失败: {str(e)}")
-                print(f"     错误类型: {type(e).__name__}")
-                import traceback
-                print(f"     详细错误:\n{traceback.format_exc()}")
-                continue
-        
-        print(f"开始搜索新闻，第二批次网站: {target_sites_batch2}")
+        print(f"开始搜索新闻，站点批次: {plan.sites_summary()}")
         
-        # 第二批次：新增网站（新浪、澎湃网、36氪）
-        for idx, query in enumerate(batch2_queries, 1):
-            try:
-                print(f"\n[批次2-{idx}/{len(batch2_queries)}] 开始搜索: '{query}'")
-                print(f"  目标网站: {target_sites_batch2}")
-                
-                web_items, _, _, _ = web_search(
-                    ctx=ctx,
-                    query=query,
-                    search_type="web",
-                    count=10,
-                    need_summary=True,
-                    need_content=True,
-                    sites=target_sites_batch2
-                )
-                
-                print(f"  ✅ 成功获取到 {len(web_items)} 条新闻")
-                if len(web_items) > 0:
-                    print(f"     - {web_items[0].Title[:50]}...")
-                
-                all_web_items.extend(web_items)
-                search_success_count += 1
-                
-            except Exception as e:
-                search_fail_count += 1
-                print(f"  ❌ 搜索失败: {str(e)}")
-                continue
-        
-        print(f"开始搜索新闻，第三批次网站: {target_sites_batch3}")
-        
-        # 第三批次：新增网站（环球医疗器械网、新浪财经）
-        for idx, query in enumerate(batch3_queries, 1):
-            try:
-                print(f"\n[批次3-{idx}/{len(batch3_queries)}] 开始搜索: '{query}'")
-                print(f"  目标网站: {target_sites_batch3}")
-                
-                web_items, _, _, _ = web_search(
-                    ctx=ctx,
-                    query=query,
-                    search_type="web",
-                    count=10,
-                    need_summary=True,
-                    need_content=True,
-                    sites=target_sites_batch3
-                )
-                
-                print(f"  ✅ 成功获取到 {len(web_items)} 条新闻")
-                if len(web_items) > 0:
-                    print(f"     - {web_items[0].Title[:50]}...")
-                
-                all_web_items.extend(web_items)
-                search_success_count += 1
-                
-            except Exception as e:
+        for result in plan.search(ctx):
+            print(f"\n[{result.task.label}] 搜索: '{result.task.query}'")
+            print(f"  目标网站: {result.task.sites}")
+            if not result.ok:
                 search_fail_count += 1
-                print(f"  ❌ 搜索失败: {str(e)}")
+                print(f"  ❌ 搜索失败: {str(result.error)}")
+                print(f"     错误类型: {type(result.error).__name__}")
                 continue
+            
+            web_items = result.web_items
+            print(f"  ✅ 成功获取到 {len(web_items)} 条新闻")
+            for item in web_items[:3]:  # 只打印前3条，避免日志过长
+                print(f"     - {item.Title[:50]}...")
+            if len(web_items) > 3:
+                print(f"     ... 还有 {len(web_items)-3} 条")
+            
+            all_web_items.extend(web_items)
+            search_success_count += 1
         
         print(f"\n{'='*60}")
         print(f"搜索完成统计:")
@@ -236,7 +132,8 @@ def fetch_news_node(state: FetchNewsInput, config: RunnableConfig, runtime: Runt
             news_item = NewsItem(
                 title=item.Title or "",
                 date=publish_date,
-                url=item.Url,
+                url=canonicalize_url(item.Url),
+                original_url=item.Url,
                 summary=item.Snippet or "",
                 content=item.Content or "",
                 keywords=[]
@@ -256,11 +153,8 @@ def fetch_news_node(state: FetchNewsInput, config: RunnableConfig, runtime: Runt
         seen_titles = set()
         final_news = []
         for news in unique_by_url:
-            # 标准化标题：去除空格和特殊字符，转小写
-            normalized_title = news.title.lower().strip()
-            # 移除一些常见的网站名称后缀
-            for suffix in ['| toutiao', '- 今日头条', '_头条', '_新闻', '_资讯']:
-                normalized_title = normalized_title.replace(suffix.lower(), '')
+            # 标准化标题：全角/半角折叠、去除站点名后缀与标点
+            normalized_title = normalize_title(news.title)
             
             if normalized_title not in seen_titles:
                 seen_titles.add(normalized_title)
@@ -303,6 +197,10 @@ def deduplicate_news_node(state: DeduplicateNewsInput, config: RunnableConfig, r
     try:
         from storage.database.db import get_session
         from storage.database.news_history_manager import NewsHistoryManager
+        from storage.database.history_fingerprints import load_history_lookup
+        from utils.news.near_dup import NEAR_DUP_ENABLED, NEAR_DUP_HISTORY_DAYS
+        from utils.news.title_norm import normalize_title
+        from utils.news.pipeline import drop_near_duplicates
         
         # 获取数据库会话
         db = get_session()
@@ -311,11 +209,14 @@ def deduplicate_news_node(state: DeduplicateNewsInput, config: RunnableConfig, r
             # 创建管理器
             mgr = NewsHistoryManager()
             
-            # 获取所有历史新闻的URL和标题
-            history_urls = mgr.get_all_urls(db)
-            history_titles = mgr.get_all_titles(db)
+            # 只确认本次候选的URL和标题是否已存在（指纹预筛 + 一次数据库查询）
+            history_lookup = load_history_lookup()
+            history_urls, history_titles = history_lookup.existing(
+                [news.url for news in state.filtered_news_list],
+                [title for news in state.filtered_news_list for title in (normalize_title(news.title), news.title)]
+            )
             
-            print(f"历史记录中共有 {len(history_urls)} 个URL，{len(history_titles)} 个标题")
+            print(f"候选中已存在于历史记录: {len(history_urls)} 个URL，{len(history_titles)} 个标题")
             
             # 去重逻辑
             deduplicated_news = []
@@ -328,8 +229,8 @@ def deduplicate_news_node(state: DeduplicateNewsInput, config: RunnableConfig, r
                     print(f"URL重复，跳过: {news.title}")
                     continue
                 
-                # 2. 检查标题是否已存在
-                if news.title in history_titles:
+                # 2. 检查标题是否已存在（标准形式；较早的历史记录保存的是原始标题）
+                if normalize_title(news.title) in history_titles or news.title in history_titles:
                     duplicate_count += 1
                     print(f"标题重复，跳过: {news.title}")
                     continue
@@ -338,6 +239,14 @@ def deduplicate_news_node(state: DeduplicateNewsInput, config: RunnableConfig, r
                 deduplicated_news.append(news)
             
             print(f"去重完成: 原始 {len(state.filtered_news_list)} 条，去重 {duplicate_count} 条，剩余 {len(deduplicated_news)} 条")
+
+            # 近似重复：转载稿标题/正文略有差异，批次内以及与最近发送过的新闻比较
+            if NEAR_DUP_ENABLED:
+                recent_history = mgr.get_recent_titles(db, NEAR_DUP_HISTORY_DAYS)
+                deduplicated_news, near_dropped = drop_near_duplicates(deduplicated_news, recent_history)
+                for news, duplicate_of in near_dropped:
+                    print(f"近似重复，跳过: {news.title}（与 {duplicate_of} 重复）")
+                print(f"近似重复过滤: 过滤 {len(near_dropped)} 条，剩余 {len(deduplicated_news)} 条")
             
             # 如果去重后没有新闻，打印警告
             if not deduplicated_news:
@@ -367,133 +276,70 @@ def enrich_news_node(state: EnrichNewsInput, config: RunnableConfig, runtime: Ru
         print("新闻列表为空，跳过新闻丰富")
         return EnrichNewsOutput(enriched_news_list=[])
     
-    # 读取配置文件
+    # 进程级新闻丰富运行时：配置按修改时间缓存，模型客户端（连接池）与提示词模板只构建一次
+    from tools.enrich_runtime import get_enrich_runtime, get_enrich_stats, apply_enrichment
+    from tools.enrich_cache import ENRICH_CACHE_ENABLED, get_enrich_cache
+
     cfg_file = os.path.join(os.getenv("COZE_WORKSPACE_PATH"), config['metadata']['llm_cfg'])
-    with open(cfg_file, 'r') as fd:
-        _cfg = json.load(fd)
-    
-    llm_config = _cfg.get("config", {})
-    system_prompt = _cfg.get("sp", "")
-    user_prompt_template = _cfg.get("up", "")
-    
-    # 导入大语言模型调用
-    from langchain_openai import ChatOpenAI
-    from langchain_core.messages import SystemMessage, HumanMessage, BaseMessageChunk
-    from coze_coding_utils.runtime_ctx.context import default_headers
-    
-    api_key = os.getenv("COZE_WORKLOAD_IDENTITY_API_KEY")
-    base_url = os.getenv("COZE_INTEGRATION_MODEL_BASE_URL")
+    enrich_runtime = get_enrich_runtime(cfg_file)
     
-    enriched_news = []
-    
-    for news in state.deduplicated_news_list:
-        try:
-            # 渲染用户提示词
-            up_tpl = Template(user_prompt_template)
-            user_prompt = up_tpl.render({
-                "title": news.title,
-                "content": news.content
-            })
-            
-            # 调用大语言模型
-            llm = ChatOpenAI(
-                model=llm_config.get("model", "doubao-seed-1-6-251015"),
-                api_key=api_key,
-                base_url=base_url,
-                streaming=True,
-                extra_body={
-                    "thinking": {
-                        "type": "disabled"
-                    }
-                },
-                temperature=llm_config.get("temperature", 0.5),
-                max_tokens=llm_config.get("max_tokens", 800),
-                default_headers=default_headers(ctx),
-            )
-            
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=user_prompt)
-            ]
-            
-            # 收集流式输出
-            result_text = ""
-            for chunk in llm.stream(messages):
-                if isinstance(chunk.content, str):
-                    result_text += chunk.content
-                elif isinstance(chunk.content, list):
-                    for item in chunk.content:
-                        if isinstance(item, str):
-                            result_text += item
-            
-            # 解析结果 - 尝试提取JSON格式的摘要、来源、地区和关键词
-            try:
-                import re
-                
-                # 方法1: 尝试直接解析整个文本为JSON
-                result_json = None
-                try:
-                    result_json = json.loads(result_text.strip())
-                except:
-                    pass
-                
-                # 方法2: 如果直接解析失败，使用正则表达式提取JSON对象
-                if not result_json:
-                    # 查找第一个完整的JSON对象（支持跨行）
-                    json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', result_text, re.DOTALL)
-                    if json_match:
-                        try:
-                            result_json = json.loads(json_match.group())
-                        except:
-                            pass
-                
-                # 方法3: 尝试匹配包含所有字段的JSON
-                if not result_json:
-                    json_match = re.search(r'\{[^}]*"summary"[^}]*"source"[^}]*"region"[^}]*"keywords"[^}]*\}', result_text, re.DOTALL)
-                    if json_match:
-                        try:
-                            result_json = json.loads(json_match.group())
-                        except:
-                            pass
-                
-                # 提取字段
-                if result_json and isinstance(result_json, dict):
-                    summary = result_json.get("summary", news.summary)
-                    source = result_json.get("source", "")
-                    region = result_json.get("region", "")
-                    keywords = result_json.get("keywords", [])
-                    
-                    # 确保keywords是列表
-                    if not isinstance(keywords, list):
-                        if isinstance(keywords, str):
-                            keywords = [k.strip() for k in keywords.split(',') if k.strip()]
-                        else:
-                            keywords = []
-                else:
-                    # 所有方法都失败，使用默认值
-                    summary = news.summary
-                    source = ""
-                    region = ""
-                    keywords = []
-                    
-            except Exception as e:
-                print(f"解析JSON失败: {str(e)}, 使用默认值")
-                summary = news.summary
-                source = ""
-                region = ""
-                keywords = []
-            
-            # 更新新闻项
-            news.summary = summary
-            news.source = source
-            news.region = region
-            news.keywords = keywords
-            enriched_news.append(news)
-            
-        except Exception as e:
-            # 如果丰富失败，保留原始新闻
-            print(f"丰富新闻失败: {str(e)}, 保留原始新闻")
-            enriched_news.append(news)
+    # 按 token 预算把多条新闻打包为一个请求（批量模式），各批次并发调用大语言模型，
+    # 同时在途的请求数由配置 max_in_flight 控制；结果按原顺序汇总
+    import contextvars
+    from concurrent.futures import ThreadPoolExecutor
+
+    news_list = state.deduplicated_news_list
+    start = datetime.now()
+
+    # 正文去除模板文字并按 token 预算截取（导语优先），记录每条新闻截取前后的 token 数
+    content_budget = enrich_runtime.cfg.content_token_budget
+    for news in news_list:
+        trimmed = enrich_runtime.trimmed(news)
+        news.content_tokens = trimmed.original_tokens
+        news.prompt_content_tokens = trimmed.trimmed_tokens
+    original_total = sum(news.content_tokens for news in news_list)
+    trimmed_total = sum(news.prompt_content_tokens for news in news_list)
+    print(f"正文截取: 预算 {content_budget or '不限'} token/条，正文共 {original_total} token，"
+          f"截取后 {trimmed_total} token，截取 {sum(1 for n in news_list if n.prompt_content_tokens < n.content_tokens)} 条")
+
+    # 先查丰富结果缓存（模型+提示词版本+标题+正文），命中的新闻不再调用大语言模型
+    enrich_cache = get_enrich_cache() if ENRICH_CACHE_ENABLED else None
+    pending_news = news_list
+    if enrich_cache is not None:
+        cache_keys = [enrich_runtime.cache_key(news) for news in news_list]
+        cached_results = enrich_cache.get_many(cache_keys)
+        pending_news = []
+        for news, key in zip(news_list, cache_keys):
+            if key in cached_results:
+                apply_enrichment(news, cached_results[key])
+            else:
+                pending_news.append(news)
+        print(f"丰富结果缓存: 命中 {len(news_list) - len(pending_news)} 条，待丰富 {len(pending_news)} 条")
+
+    # 新闻项在原对象上更新，汇总结果即原列表顺序
+    batches = enrich_runtime.plan_batches(pending_news)
+    max_in_flight = max(1, min(enrich_runtime.cfg.max_in_flight, len(batches)))
+    with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="enrich_news") as pool:
+        futures = [
+            pool.submit(contextvars.copy_context().run, enrich_runtime.enrich_batch, batch, ctx, enrich_cache)
+            for batch in batches
+        ]
+        for future in futures:
+            future.result()
+    enriched_news = list(news_list)
+    print(f"新闻丰富完成: {len(enriched_news)} 条，{len(batches)} 个批次，并发 {max_in_flight}，"
+          f"耗时 {(datetime.now() - start).total_seconds():.1f}s")
+    if enrich_cache is not None:
+        evicted = enrich_cache.evict_expired()
+        if evicted:
+            print(f"清理了 {evicted} 条过期的丰富结果缓存")
+    enrich_stats = get_enrich_stats()
+    print(f"丰富运行时统计: 配置复用率 {enrich_stats['config_reuse_rate']:.0%}，模型请求 {enrich_stats['requests']} 次，"
+          f"客户端构建 {enrich_stats['client_builds']} 次，客户端复用率 {enrich_stats['client_reuse_rate']:.0%}")
+    if enrich_stats['batch_requests']:
+        print(f"批量丰富统计: 批量请求 {enrich_stats['batch_requests']} 次，批量成功 {enrich_stats['batch_items']} 条，"
+              f"改为逐条请求 {enrich_stats['batch_fallbacks']} 条")
+    print(f"输出解析统计: JSON 闭合后提前结束 {enrich_stats['early_stops']} 次，输出不完整 {enrich_stats['parse_failures']} 次")
     
     return EnrichNewsOutput(enriched_news_list=enriched_news)
 
@@ -579,6 +425,7 @@ def create_table_node(state: CreateTableInput, config: RunnableConfig, runtime:
                 "地区": [],
                 "关键词": [],
                 "链接": [],
+                "其他来源": [],
                 "摘要": []
             }
             df = pd.DataFrame(empty_data)
@@ -606,7 +453,8 @@ def create_table_node(state: CreateTableInput, config: RunnableConfig, runtime:
                 "来源": news.source,
                 "地区": news.region,
                 "关键词": keywords_str,
-                "链接": news.url,
+                "链接": news.original_url or news.url,
+                "其他来源": "\n".join(news.alternate_urls),
                 "摘要": news.summary
             })
         
@@ -638,6 +486,143 @@ def create_table_node(state: CreateTableInput, config: RunnableConfig, runtime:
         raise Exception(f"创建表格失败: {str(e)}")
 
 
+def _render_news_digest_html(news_list: List[NewsItem], today: str, heading: str = "医疗器械医美新闻汇总") -> str:
+    """构建带新闻列表的汇总邮件正文（HTML）"""
+    html_content = f"""
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 800px; margin: 0 auto; padding: 20px; }}
+            .header {{ background-color: #4CAF50; color: white; padding: 20px; text-align: center; }}
+            .summary {{ background-color: #f8f8f8; padding: 15px; border-radius: 5px; margin: 20px 0; }}
+            .attachment-note {{ background-color: #fff3cd; border: 1px solid #ffeeba; padding: 15px; border-radius: 5px; margin: 20px 0; text-align: center; }}
+            .news-item {{ border: 1px solid #ddd; padding: 15px; margin: 10px 0; border-radius: 5px; }}
+            .news-item:hover {{ box-shadow: 0 2px 5px rgba(0,0,0,0.1); }}
+            .news-title {{ font-size: 18px; font-weight: bold; margin-bottom: 10px; color: #2c3e50; }}
+            .news-meta {{ color: #666; font-size: 14px; margin-bottom: 10px; }}
+            .news-summary {{ margin-bottom: 10px; }}
+            .news-keywords {{ color: #e74c3c; font-size: 14px; }}
+            .news-link {{ color: #3498db; text-decoration: none; }}
+            .news-link:hover {{ text-decoration: underline; }}
+            .footer {{ text-align: center; margin-top: 30px; color: #999; font-size: 12px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h2>{heading}</h2>
+                <p>日期: {today}</p>
+            </div>
+
+            <div class="summary">
+                <p><strong>共收集到 {len(news_list)} 条相关新闻</strong></p>
+                <p>来源: 网络搜集</p>
+            </div>
+    """
+
+    # 添加每条新闻
+    for idx, news in enumerate(news_list, 1):
+        keywords_str = ", ".join(news.keywords) if news.keywords else "无"
+        source_str = news.source if news.source else "未知"
+        region_str = news.region if news.region else "-"
+        alternate_links = "".join(
+            f' <a href="{url}" class="news-link">[{i}]</a>' for i, url in enumerate(news.alternate_urls, 1)
+        )
+        alternate_html = f"<div><strong>其他来源:</strong>{alternate_links}</div>" if alternate_links else ""
+        html_content += f"""
+        <div class="news-item">
+            <div class="news-title">{idx}. {news.title}</div>
+            <div class="news-meta">
+                <strong>日期:</strong> {news.date} |
+                <strong>来源:</strong> {source_str} |
+                <strong>地区:</strong> {region_str} |
+                <strong>关键词:</strong> <span class="news-keywords">{keywords_str}</span>
+            </div>
+            <div class="news-summary">
+                <strong>摘要:</strong> {news.summary}
+            </div>
+            <div>
+                <a href="{news.original_url or news.url}" class="news-link">查看原文 &rarr;</a>
+            </div>
+            {alternate_html}
+        </div>
+    """
+
+    html_content += f"""
+            <div class="footer">
+                <p>此邮件由Huxg自动发送</p>
+                <p>如有问题，请联系管理员</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    return html_content
+
+
+def _send_mail(email_config: dict, recipient_email: str, msg) -> None:
+    """通过 SMTP SSL 将邮件只发送给一个收件人"""
+    import ssl
+    import smtplib
+
+    ctx_ssl = ssl.create_default_context()
+    ctx_ssl.minimum_version = ssl.TLSVersion.TLSv1_2
+
+    with smtplib.SMTP_SSL(
+        email_config["smtp_server"],
+        email_config["smtp_port"],
+        context=ctx_ssl,
+        timeout=30
+    ) as server:
+        server.ehlo()
+        server.login(email_config["account"], email_config["auth_code"])
+        # 只发送给当前收件人
+        server.sendmail(email_config["account"], [recipient_email], msg.as_string())
+        server.quit()
+
+
+def _send_profile_digests(email_config: dict, news_list: List[NewsItem],
+                          profile_news_urls: Dict[str, List[str]], today: str) -> Tuple[int, List[str]]:
+    """
+    按专题发送汇总邮件：配置了收件人的专题各自收到本专题的新闻（HTML，不含附件）
+    返回 (成功发送数, 失败信息列表)
+    """
+    from email.mime.text import MIMEText
+    from email.header import Header
+    from email.utils import formataddr, formatdate, make_msgid
+    from tools.query_plan import get_search_plan
+
+    plan = get_search_plan()
+    news_by_url = {news.url: news for news in news_list}
+    sent, failed = 0, []
+    for name, urls in profile_news_urls.items():
+        profile = plan.get_profile(name)
+        if profile is None or not profile.emails_list:
+            continue
+        profile_news = [news_by_url[url] for url in urls if url in news_by_url]
+        if not profile_news:
+            print(f"专题 {name} 没有新闻，不发送专题邮件")
+            continue
+        heading = f"{profile.desc or profile.name}新闻汇总"
+        html_content = _render_news_digest_html(profile_news, today, heading)
+        for recipient_email in profile.emails_list:
+            try:
+                msg = MIMEText(html_content, 'html', 'utf-8')
+                msg["From"] = formataddr(("Huxg", email_config["account"]))
+                msg["To"] = recipient_email
+                msg["Subject"] = Header(f"{heading} - {today}", 'utf-8')
+                msg["Date"] = formatdate(localtime=True)
+                msg["Message-ID"] = make_msgid()
+                _send_mail(email_config, recipient_email, msg)
+                sent += 1
+                print(f"✅ 专题 {name} 邮件（{len(profile_news)} 条）已成功发送到: {recipient_email}")
+            except Exception as e:
+                print(f"❌ 专题 {name} 邮件发送到 {recipient_email} 失败: {str(e)}")
+                failed.append(f"{name}/{recipient_email}: {str(e)}")
+    return sent, failed
+
+
 def send_email_node(state: SendEmailInput, config: RunnableConfig, runtime: Runtime[Context]) -> SendEmailOutput:
     """
     title: 发送邮件通知
@@ -649,7 +634,6 @@ def send_email_node(state: SendEmailInput, config: RunnableConfig, runtime: Runt
     try:
         # 导入邮件相关模块
         import smtplib
-        import ssl
         import os
         from email.mime.multipart import MIMEMultipart
         from email.mime.text import MIMEText
@@ -691,71 +675,7 @@ def send_email_node(state: SendEmailInput, config: RunnableConfig, runtime: Runt
                     email_message=f"表格文件不存在: {state.table_filepath}"
                 )
             
-            html_content = f"""
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .container {{ max-width: 800px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background-color: #4CAF50; color: white; padding: 20px; text-align: center; }}
-                    .summary {{ background-color: #f8f8f8; padding: 15px; border-radius: 5px; margin: 20px 0; }}
-                    .attachment-note {{ background-color: #fff3cd; border: 1px solid #ffeeba; padding: 15px; border-radius: 5px; margin: 20px 0; text-align: center; }}
-                    .news-item {{ border: 1px solid #ddd; padding: 15px; margin: 10px 0; border-radius: 5px; }}
-                    .news-item:hover {{ box-shadow: 0 2px 5px rgba(0,0,0,0.1); }}
-                    .news-title {{ font-size: 18px; font-weight: bold; margin-bottom: 10px; color: #2c3e50; }}
-                    .news-meta {{ color: #666; font-size: 14px; margin-bottom: 10px; }}
-                    .news-summary {{ margin-bottom: 10px; }}
-                    .news-keywords {{ color: #e74c3c; font-size: 14px; }}
-                    .news-link {{ color: #3498db; text-decoration: none; }}
-                    .news-link:hover {{ text-decoration: underline; }}
-                    .footer {{ text-align: center; margin-top: 30px; color: #999; font-size: 12px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h2>医疗器械医美新闻汇总</h2>
-                        <p>日期: {today}</p>
-                    </div>
-                    
-                    <div class="summary">
-                        <p><strong>共收集到 {len(state.enriched_news_list)} 条相关新闻</strong></p>
-                        <p>来源: 网络搜集</p>
-                    </div>
-            """
-            
-            # 添加每条新闻
-            for idx, news in enumerate(state.enriched_news_list, 1):
-                keywords_str = ", ".join(news.keywords) if news.keywords else "无"
-                source_str = news.source if news.source else "未知"
-                region_str = news.region if news.region else "-"
-                html_content += f"""
-                <div class="news-item">
-                    <div class="news-title">{idx}. {news.title}</div>
-                    <div class="news-meta">
-                        <strong>日期:</strong> {news.date} |
-                        <strong>来源:</strong> {source_str} |
-                        <strong>地区:</strong> {region_str} |
-                        <strong>关键词:</strong> <span class="news-keywords">{keywords_str}</span>
-                    </div>
-                    <div class="news-summary">
-                        <strong>摘要:</strong> {news.summary}
-                    </div>
-                    <div>
-                        <a href="{news.url}" class="news-link">查看原文 &rarr;</a>
-                    </div>
-                </div>
-            """
-            
-            html_content += f"""
-                    <div class="footer">
-                        <p>此邮件由Huxg自动发送</p>
-                        <p>如有问题，请联系管理员</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
+            html_content = _render_news_digest_html(state.enriched_news_list, today)
             
             # 读取Excel文件内容
             with open(state.table_filepath, 'rb') as f:
@@ -856,20 +776,7 @@ def send_email_node(state: SendEmailInput, config: RunnableConfig, runtime: Runt
                     msg["Message-ID"] = make_msgid()
                 
                 # 发送邮件
-                ctx_ssl = ssl.create_default_context()
-                ctx_ssl.minimum_version = ssl.TLSVersion.TLSv1_2
-                
-                with smtplib.SMTP_SSL(
-                    email_config["smtp_server"],
-                    email_config["smtp_port"],
-                    context=ctx_ssl,
-                    timeout=30
-                ) as server:
-                    server.ehlo()
-                    server.login(email_config["account"], email_config["auth_code"])
-                    # 只发送给当前收件人
-                    server.sendmail(email_config["account"], [recipient_email], msg.as_string())
-                    server.quit()
+                _send_mail(email_config, recipient_email, msg)
                 
                 success_count += 1
                 if is_first_recipient and has_news:
@@ -881,6 +788,17 @@ def send_email_node(state: SendEmailInput, config: RunnableConfig, runtime: Runt
                 print(f"❌ 发送到 {recipient_email} 失败: {str(e)}")
                 failed_emails.append(f"{recipient_email}: {str(e)}")
         
+        # 多专题：配置了收件人的专题另外收到本专题的新闻
+        profile_note = ""
+        if has_news and state.profile_news_urls:
+            profile_sent, profile_failed = _send_profile_digests(
+                email_config, state.enriched_news_list, state.profile_news_urls, today
+            )
+            if profile_sent or profile_failed:
+                profile_note = f"；专题邮件成功 {profile_sent} 封"
+                if profile_failed:
+                    profile_note += f"，失败: {', '.join(profile_failed)}"
+
         # 返回发送结果
         if success_count > 0:
             if failed_emails:
@@ -896,12 +814,12 @@ def send_email_node(state: SendEmailInput, config: RunnableConfig, runtime: Runt
                     message = f"已成功发送通知邮件到所有 {success_count} 个收件人（今日无新新闻）"
             return SendEmailOutput(
                 email_sent=True,
-                email_message=message
+                email_message=message + profile_note
             )
         else:
             return SendEmailOutput(
                 email_sent=False,
-                email_message=f"邮件发送失败: {', '.join(failed_emails)}"
+                email_message=f"邮件发送失败: {', '.join(failed_emails)}{profile_note}"
             )
         
     except smtplib.SMTPAuthenticationError as e:
@@ -940,6 +858,7 @@ def save_news_history_node(state: SaveNewsHistoryInput, config: RunnableConfig,
     try:
         from storage.database.db import get_session
         from storage.database.news_history_manager import NewsHistoryManager, NewsHistoryCreate
+        from utils.news.title_norm import normalize_title
         
         # 获取数据库会话
         db = get_session()
@@ -951,13 +870,15 @@ def save_news_history_node(state: SaveNewsHistoryInput, config: RunnableConfig,
             # 准备批量创建的数据
             news_history_list = []
             for news in state.enriched_news_list:
+                # 历史记录保存标准化标题，作为之后标题去重的键
                 news_create = NewsHistoryCreate(
-                    title=news.title,
+                    title=normalize_title(news.title),
                     url=news.url,
                     date=news.date,
                     source=news.source
                 )
                 news_history_list.append(news_create)
+                # 同一事件的其他来源只作为链接展示，不记入历史：误合并时这些新闻之后仍可单独发送
             
             # 批量保存到数据库
             saved_records = mgr.batch_create_news_history(db, news_history_list)
@@ -965,6 +886,17 @@ def save_news_history_node(state: SaveNewsHistoryInput, config: RunnableConfig,
             saved_count = len(saved_records)
             print(f"成功保存 {saved_count} 条新闻历史记录")
             
+            # 推进搜索水位线：只推进到各查询实际发送的新闻，且仅在邮件发送成功并入库后推进，避免漏发
+            if state.query_watermarks and not state.email_sent:
+                print("邮件未发送成功，不推进搜索水位线")
+            elif state.query_watermarks:
+                try:
+                    from storage.database.search_watermark_manager import SearchWatermarkManager
+                    advanced = SearchWatermarkManager().advance_watermarks(db, state.query_watermarks)
+                    print(f"推进了 {advanced} 个查询的搜索水位线")
+                except Exception as e:
+                    print(f"推进搜索水位线失败: {str(e)}")
+
             # 清理旧数据（删除180天之前的记录）
             try:
                 deleted_count = mgr.delete_old_news(db, days=180)
@@ -988,7 +920,8 @@ def save_news_history_node(state: SaveNewsHistoryInput, config: RunnableConfig,
 def search_until_10_node(state: SearchUntil10Input, config: RunnableConfig, runtime: Runtime[Context]) -> SearchUntil10Output:
     """
     title: 搜索新闻
-    desc: 搜索医疗器械和医美相关新闻，执行日期过滤、历史去重、检查数量流程，搜索数量范围为5-20条（如果超过20条只发送前20条）
+    desc: 搜索医疗器械和医美相关新闻，执行日期过滤、历史去重、检查数量流程，搜索数量范围为5-20条（如果超过20条只发送前20条）；
+          配置多个专题时共用一次搜索与去重，发送的新闻（共最多20条）按专题划分
     """
     import time
     ctx = runtime.context
@@ -998,8 +931,19 @@ def search_until_10_node(state: SearchUntil10Input, config: RunnableConfig, runt
     print("发送数量范围: 5-20条")
     print("=" * 80)
 
-    # 导入网络搜索函数
-    from tools.web_search_tool import web_search
+    # 导入搜索计划引擎
+    from tools.query_plan import get_search_plan
+    from tools.circuit_breaker import get_breaker_registry
+    from tools.web_search_tool import get_http_stats
+    from tools.search_cache import get_search_cache
+    from storage.database.search_watermark_manager import (
+        SEARCH_INCREMENTAL, SEARCH_WATERMARK_OVERLAP_DAYS, build_time_range, delivered_watermarks
+    )
+    from storage.database.search_query_stats_manager import QueryYield
+    from tools.query_scheduler import SEARCH_ADAPTIVE, QueryScheduler, QueryArm
+    from utils.news.pipeline import NewsStreamFilter
+    from utils.news.near_dup import NEAR_DUP_ENABLED, NEAR_DUP_HISTORY_DAYS
+    from utils.news.story_cluster import STORY_CLUSTER_ENABLED, collapse_stories
 
     # 初始化变量
     all_deduplicated_news = []  # 所有去重后的新闻（累积）
@@ -1008,19 +952,23 @@ def search_until_10_node(state: SearchUntil10Input, config: RunnableConfig, runt
     max_target = 20  # 最大发送数量
     max_searches = 1  # 最大搜索次数
 
-    # 获取历史记录（用于去重）
-    history_urls = set()
-    history_titles = set()
+    # 获取历史记录（用于去重）：指纹快照（内存映射，按主键增量刷新）预筛，可能命中的候选按查询批量到数据库确认
+    history_lookup = None
+    recent_history = []  # 最近发送过的 (URL, 标题)，用于近似重复检测
     try:
         from storage.database.db import get_session
         from storage.database.news_history_manager import NewsHistoryManager
+        from storage.database.history_fingerprints import load_history_lookup
 
+        history_lookup = load_history_lookup()
+        if history_lookup.fingerprints is not None:
+            print(f"历史指纹: {len(history_lookup.fingerprints)} 个URL指纹，快照已收录至ID {history_lookup.fingerprints.max_id}")
         db = get_session()
         try:
             mgr = NewsHistoryManager()
-            history_urls = mgr.get_all_urls(db)
-            history_titles = mgr.get_all_titles(db)
-            print(f"历史记录: {len(history_urls)} 个URL, {len(history_titles)} 个标题")
+            if NEAR_DUP_ENABLED:
+                recent_history = mgr.get_recent_titles(db, NEAR_DUP_HISTORY_DAYS)
+                print(f"近似重复检测: 载入最近 {NEAR_DUP_HISTORY_DAYS} 天的 {len(recent_history)} 条历史标题")
         finally:
             db.close()
     except Exception as e:
@@ -1032,223 +980,165 @@ def search_until_10_node(state: SearchUntil10Input, config: RunnableConfig, runt
     cutoff_date_str = three_months_ago.strftime('%Y-%m-%d')
     print(f"日期过滤截止日期: {cutoff_date_str}")
 
-    # 定义搜索参数（与子图保持一致）
-    target_sites_batch1 = "toutiao.com|sohu.com|qq.com|163.com|ifeng.com"
-    target_sites_batch2 = "sina.com.cn|thepaper.cn|36kr.com"
-    target_sites_batch3 = "ylqx.qgyyzs.net|finance.sina.com.cn"
-
-    batch1_queries = [
-        "医疗器械公司",
-        "医疗器械产品",
-        "医疗器械技术",
-        "医美公司",
-        "医美产品",
-        "医美技术"
-    ]
-
-    batch2_queries = [
-        "医疗设备",
-        "诊断设备",
-        "激光美容",
-        "整形美容",
-        "微整形"
-    ]
-
-    batch3_queries = [
-        "IVD 体外诊断",
-        "医疗器械融资",
-        "医疗器械上市",
-        "医美融资",
-        "医美上市"
-    ]
-
-    # 主循环：搜索 → 批次内去重 → 日期过滤 → 历史去重 → 累积 → 检查数量
-    while search_count < max_searches and len(all_deduplicated_news) < max_target:
-        search_count += 1
-        print("\n" + "=" * 80)
-        print(f"[循环-{search_count}/{max_searches}] 开始搜索")
-        print("=" * 80)
-
-        # 1. 搜索新闻（整合子图的搜索逻辑）
-        all_web_items = []
-        search_success_count = 0
+    # 加载声明式搜索计划（config/search_plan.json），编译为按站点打包、去除重叠域名的搜索任务
+    plan = get_search_plan()
+    plan_query_keys = plan.query_keys()
+    print(f"搜索计划: {len(plan_query_keys)} 个查询，站点批次: {plan.sites_summary()}")
+    executor = plan.executor(ctx)
+
+    # 多专题：所有专题共用一次搜索和同一个去重索引，新闻按产出它的查询划入专题
+    profile_names = plan.profile_names()
+    news_profiles = {}  # 新闻URL -> 所属专题列表
+    profile_counts = {name: 0 for name in profile_names}
+    if len(profile_names) > 1:
+        print(f"搜索专题: {profile_names}")
+
+    def assign_profiles(url, profiles):
+        assigned = news_profiles.setdefault(url, [])
+        for name in profiles:
+            if name not in assigned:
+                assigned.append(name)
+                profile_counts[name] += 1
+
+    # 增量搜索：读取每个查询的水位线，只搜索上次成功运行以来（含重叠天数）的发文
+    watermarks = {}
+    if SEARCH_INCREMENTAL:
+        try:
+            from storage.database.db import get_session
+            from storage.database.search_watermark_manager import SearchWatermarkManager
 
-        # 第一批次
-        print(f"开始搜索第一批次网站: {target_sites_batch1}")
-        for idx, query in enumerate(batch1_queries, 1):
+            db = get_session()
             try:
-                print(f"  [批次1-{idx}/{len(batch1_queries)}] 搜索: '{query}'")
-
-                web_items, _, _, _ = web_search(
-                    ctx=ctx,
-                    query=query,
-                    search_type="web",
-                    count=10,
-                    need_summary=True,
-                    need_content=True,
-                    sites=target_sites_batch1
-                )
-
-                print(f"    ✅ 获取到 {len(web_items)} 条新闻")
-                all_web_items.extend(web_items)
-                search_success_count += 1
+                watermarks = SearchWatermarkManager().get_watermarks(db, plan_query_keys)
+                print(f"搜索水位线: {len(watermarks)}/{len(plan_query_keys)} 个查询有记录，重叠 {SEARCH_WATERMARK_OVERLAP_DAYS} 天")
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"获取搜索水位线失败: {str(e)}，使用完整时间窗口")
+    query_news_urls = {}  # query_key -> 该查询产出的有效新闻URL（用于计算可推进的水位线）
 
-            except Exception as e:
-                print(f"    ❌ 搜索失败: {str(e)}")
-                continue
+    # 自适应调度：根据每个查询的历史有效产出排序、裁剪查询并调整请求条数
+    scheduler = None
+    if SEARCH_ADAPTIVE:
+        try:
+            from storage.database.db import get_session
+            from storage.database.search_query_stats_manager import SearchQueryStatsManager
 
-        # 第二批次
-        print(f"开始搜索第二批次网站: {target_sites_batch2}")
-        for idx, query in enumerate(batch2_queries, 1):
+            db = get_session()
             try:
-                print(f"  [批次2-{idx}/{len(batch2_queries)}] 搜索: '{query}'")
-
-                web_items, _, _, _ = web_search(
-                    ctx=ctx,
-                    query=query,
-                    search_type="web",
-                    count=10,
-                    need_summary=True,
-                    need_content=True,
-                    sites=target_sites_batch2
-                )
+                stats = SearchQueryStatsManager().get_stats(db, plan_query_keys)
+                scheduler = QueryScheduler({
+                    key: QueryArm(calls=row.calls, ema_survivors=row.ema_survivors, ema_hit_rate=row.ema_hit_rate)
+                    for key, row in stats.items()
+                })
+                print(f"自适应调度: {len(stats)}/{len(plan_query_keys)} 个查询有收益统计")
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"获取查询收益统计失败: {str(e)}，按默认顺序搜索")
+    query_yields = {}  # query_key -> QueryYield（本次运行累计）
+    saved_search_calls = 0  # 达到目标后提前取消而节省的搜索调用次数
 
-                print(f"    ✅ 获取到 {len(web_items)} 条新闻")
-                all_web_items.extend(web_items)
-                search_success_count += 1
+    # 流式过滤器：跨轮保留已接收新闻的URL/标题，与累积列表去重
+    stream_filter = NewsStreamFilter(today, cutoff_date_str, history_lookup,
+                                     near_dup=NEAR_DUP_ENABLED, recent_history=recent_history)
 
-            except Exception as e:
-                print(f"    ❌ 搜索失败: {str(e)}")
-                continue
+    # 主循环：搜索 → 批次内去重 → 日期过滤 → 历史去重 → 累积 → 检查数量
+    while search_count < max_searches and len(all_deduplicated_news) < max_target:
+        search_count += 1
+        print("\n" + "=" * 80)
+        print(f"[循环-{search_count}/{max_searches}] 开始搜索")
+        print("=" * 80)
 
-        # 第三批次
-        print(f"开始搜索第三批次网站: {target_sites_batch3}")
-        for idx, query in enumerate(batch3_queries, 1):
-            try:
-                print(f"  [批次3-{idx}/{len(batch3_queries)}] 搜索: '{query}'")
-
-                web_items, _, _, _ = web_search(
-                    ctx=ctx,
-                    query=query,
-                    search_type="web",
-                    count=10,
-                    need_summary=True,
-                    need_content=True,
-                    sites=target_sites_batch3
+        # 1. 并发搜索新闻（搜索计划引擎），一轮内所有查询同时发出
+        search_tasks = plan.compile()
+        for task in search_tasks:
+            # 第一轮之后绕过搜索缓存，否则只会重放上一轮的结果
+            task.use_cache = search_count == 1
+            # 计划未指定时间范围时按水位线交给搜索服务端过滤，不早于日期过滤截止日期
+            if not task.time_range:
+                task.time_range = build_time_range(
+                    watermarks.get(task.query_key) if SEARCH_INCREMENTAL else None,
+                    today, SEARCH_WATERMARK_OVERLAP_DAYS, 90
                 )
 
-                print(f"    ✅ 获取到 {len(web_items)} 条新闻")
-                all_web_items.extend(web_items)
-                search_success_count += 1
-
-            except Exception as e:
-                print(f"    ❌ 搜索失败: {str(e)}")
-                continue
+        if scheduler is not None:
+            search_tasks, pruned_tasks = scheduler.plan(search_tasks)
+            if pruned_tasks:
+                print(f"自适应调度裁剪 {len(pruned_tasks)} 个低产出查询: {[t.query for t in pruned_tasks]}")
 
-        print(f"\n搜索完成: 成功 {search_success_count} 个查询，原始 {len(all_web_items)} 条")
-
-        # 2. 转换为NewsItem格式
-        raw_news_list = []
-        for item in all_web_items:
-            if not item.Url:
-                continue
-
-            # 解析日期
-            if item.PublishTime:
-                try:
-                    publish_date = item.PublishTime.split('T')[0]
-                except:
-                    publish_date = today.strftime('%Y-%m-%d')
-            else:
-                publish_date = today.strftime('%Y-%m-%d')
-
-            news_item = NewsItem(
-                title=item.Title or "",
-                date=publish_date,
-                url=item.Url,
-                summary=item.Snippet or "",
-                content=item.Content or "",
-                keywords=[]
-            )
-            raw_news_list.append(news_item)
-
-        print(f"转换为NewsItem: {len(raw_news_list)} 条")
-
-        # 3. 批次内去重（URL和标题）
-        seen_urls = set()
-        unique_by_url = []
-        for news in raw_news_list:
-            if news.url not in seen_urls:
-                seen_urls.add(news.url)
-                unique_by_url.append(news)
-
-        seen_titles = set()
-        batch_deduplicated_news = []
-        for news in unique_by_url:
-            normalized_title = news.title.lower().strip()
-            for suffix in ['| toutiao', '- 今日头条', '_头条', '_新闻', '_资讯']:
-                normalized_title = normalized_title.replace(suffix.lower(), '')
-
-            if normalized_title not in seen_titles:
-                seen_titles.add(normalized_title)
-                batch_deduplicated_news.append(news)
-
-        print(f"批次内去重: {len(raw_news_list)} -> {len(batch_deduplicated_news)} 条")
-
-        # 4. 日期过滤（近3个月）
-        filtered_news = []
-        for news in batch_deduplicated_news:
-            try:
-                # 解析新闻日期
-                news_date = news.date if news.date else today.strftime('%Y-%m-%d')
-
-                # 检查日期格式
-                import re
-                if not re.match(r'^\d{4}-\d{2}-\d{2}$', news_date):
-                    print(f"  日期格式无效，跳过: {news.title}")
-                    continue
-
-                # 判断日期是否在近3个月内
-                if news_date >= cutoff_date_str:
-                    filtered_news.append(news)
-                else:
-                    print(f"  新闻已过滤（日期过早）: {news.title}, 日期: {news_date}")
-
-            except Exception as e:
-                print(f"  处理日期失败: {str(e)}, 跳过新闻: {news.title}")
-                continue
-
-        print(f"日期过滤: {len(batch_deduplicated_news)} -> {len(filtered_news)} 条")
-
-        # 5. 历史记录去重
+        search_success_count = 0
+        search_start = time.time()
         new_deduplicated_news = []
-        duplicate_count = 0
-
-        for news in filtered_news:
-            # 检查URL是否在历史记录中
-            if news.url in history_urls:
-                duplicate_count += 1
-                continue
-
-            # 检查标题是否在历史记录中
-            if news.title in history_titles:
-                duplicate_count += 1
-                continue
-
-            # 检查URL是否已在本次累积列表中
-            if any(n.url == news.url for n in all_deduplicated_news):
-                duplicate_count += 1
+        stream_filter.start_round()
+
+        # 2-5. 流式处理：每个查询的结果按查询顺序到达即完成 转换 → 批次内去重 → 日期过滤 → 历史去重，
+        # 与串行执行保留的条目一致；有效新闻达到上限后不再等待剩余查询
+        search_results = executor.iter_ordered(search_tasks)
+        for result in search_results:
+            if not result.ok:
+                print(f"  [{result.task.label}] '{result.task.query}' ❌ 搜索失败: {str(result.error)}")
                 continue
 
-            # 检查标题是否已在本次累积列表中
-            if any(n.title == news.title for n in all_deduplicated_news):
-                duplicate_count += 1
-                continue
-
-            # 通过所有去重检查
-            new_deduplicated_news.append(news)
-
-        print(f"历史去重: 去重 {duplicate_count} 条，新增 {len(new_deduplicated_news)} 条")
+            search_success_count += 1
+            key = result.task.query_key
+            query_yield = query_yields.setdefault(key, QueryYield(query_key=key))
+            query_yield.raw_items += len(result.web_items)
+
+            survivors = list(stream_filter.feed(result.web_items))
+            query_yield.survivors += len(survivors)
+            new_deduplicated_news.extend(survivors)
+            query_urls = query_news_urls.setdefault(key, [])
+            for news in survivors:
+                assign_profiles(news.url, result.task.profiles)
+                query_urls.append(news.url)
+            # 与已接收新闻重复的条目不再重复收录，但其所属专题同样需要这条新闻
+            for accepted_url in stream_filter.accepted_hits:
+                assign_profiles(accepted_url, result.task.profiles)
+                query_urls.append(accepted_url)
+            print(f"  [{result.task.label}] '{result.task.query}' ✅ 获取到 {len(result.web_items)} 条新闻，"
+                  f"有效 {len(survivors)} 条 ({result.elapsed:.1f}s)")
+
+            if len(all_deduplicated_news) + len(new_deduplicated_news) >= max_target:
+                print(f"  有效新闻已达到最大发送数量 ({max_target})，取消剩余查询")
+                break
+        # 提前终止时取消排队中的查询，不再等待在途查询
+        search_results.close()
+        run_stats = executor.last_run_stats
+        round_saved = run_stats["cancelled"] + run_stats["skipped"]
+        saved_search_calls += round_saved
+        if run_stats["consumed"] < run_stats["total"]:
+            print(f"  提前终止: 取消 {round_saved} 个未发出的查询，放弃等待 {run_stats['abandoned']} 个在途查询")
+
+        print(f"本轮并发搜索耗时: {time.time() - search_start:.1f}s（{len(search_tasks)} 个查询）")
+        http_stats = get_http_stats()
+        print(f"HTTP连接统计: 请求 {http_stats['requests']} 次，新建连接 {http_stats['connections']} 个，"
+              f"复用率 {http_stats['reuse_rate']:.0%}，重试 {http_stats['retries']} 次")
+        rate_stats = http_stats['rate_limit']
+        print(f"搜索限流统计: 等待 {rate_stats['waited']} 次，共 {rate_stats['wait_seconds']}s，"
+              f"服务端限流 {rate_stats['server_throttles']} 次")
+        cache_stats = get_search_cache().get_stats()
+        print(f"搜索缓存统计: 内存命中 {cache_stats['memory_hits']} 次，磁盘命中 {cache_stats['disk_hits']} 次，"
+              f"未命中 {cache_stats['misses']} 次")
+        if run_stats["breaker_skipped"] or run_stats["hedged"]:
+            print(f"熔断跳过 {run_stats['breaker_skipped']} 个查询，对冲请求 {run_stats['hedged']} 次")
+        for sites_key, breaker_state in get_breaker_registry().snapshot().items():
+            if breaker_state["state"] != "closed":
+                print(f"  ⚠️ 站点批次 {sites_key} 熔断状态: {breaker_state['state']}，"
+                      f"连续失败 {breaker_state['consecutive_failures']} 次，剩余冷却 {breaker_state['cooldown_remaining']}s")
+
+        filter_stats = stream_filter.stats
+        print(f"\n搜索完成: 成功 {search_success_count} 个查询，原始 {filter_stats['raw']} 条")
+        print(f"转换为NewsItem: {filter_stats['converted']} 条")
+        print(f"批次内去重: {filter_stats['converted']} -> {filter_stats['batch_unique']} 条")
+        print(f"日期过滤: {filter_stats['batch_unique']} -> {filter_stats['date_kept']} 条"
+              f"（日期无效 {filter_stats['date_invalid']} 条，日期过早 {filter_stats['date_old']} 条）")
+        print(f"历史去重: 去重 {filter_stats['history_duplicates']} 条，近似重复 {filter_stats['near_duplicates']} 条，"
+              f"新增 {len(new_deduplicated_news)} 条")
+        if history_lookup is not None:
+            lookup_stats = history_lookup.stats
+            print(f"历史查询: 候选 {lookup_stats['candidates']} 个，指纹命中 {lookup_stats['probable']} 个，"
+                  f"数据库确认 {lookup_stats['confirmed']} 个（{lookup_stats['db_queries']} 次查询）")
 
         # 6. 累积去重后的新闻
         all_deduplicated_news.extend(new_deduplicated_news)
@@ -1257,32 +1147,36 @@ def search_until_10_node(state: SearchUntil10Input, config: RunnableConfig, runt
         print(f"  本次新增: {len(new_deduplicated_news)} 条")
         print(f"  累积总数: {len(all_deduplicated_news)} 条")
         print(f"  最大发送数量: {max_target} 条")
+        if len(profile_names) > 1:
+            print(f"  各专题数量: {profile_counts}")
 
         # 7. 检查是否达到最大目标
         if len(all_deduplicated_news) >= max_target:
             print(f"✅ 已达到最大发送数量 ({len(all_deduplicated_news)} >= {max_target})，停止搜索")
             break
+        elif not new_deduplicated_news:
+            print(f"⚠️ 本轮没有新增新闻，停止搜索")
+            break
         elif search_count < max_searches:
-            # 未达到最大目标且还有搜索机会，智能等待后继续
-            # 根据距离目标的差距动态调整等待时间
-            remaining = max_target - len(all_deduplicated_news)
-            remaining_searches = max_searches - search_count
-
-            if remaining <= 5 or remaining_searches <= 2:
-                # 接近目标或剩余搜索次数少，短等待
-                wait_time = 5
-            elif remaining <= 10:
-                # 中等进度，中等等待
-                wait_time = 10
-            else:
-                # 刚开始，较长等待
-                wait_time = 15
-
-            print(f"\n⏳ 未达到最大目标，等待 {wait_time} 秒后继续下一次搜索...")
+            # 未达到最大目标且还有搜索机会，直接开始下一轮；请求速率由进程级搜索限流器控制
+            print(f"\n⏳ 未达到最大目标，继续下一次搜索（请求速率由搜索限流器控制）")
             print(f"   当前进度: {len(all_deduplicated_news)}/{max_target} 条")
             print(f"   搜索进度: {search_count}/{max_searches} 次")
-            time.sleep(wait_time)
-            print(f"✅ 等待结束，开始下一次搜索\n")
+
+    # 记录各查询的有效产出，供下次运行的自适应调度使用
+    if SEARCH_ADAPTIVE and query_yields:
+        try:
+            from storage.database.db import get_session
+            from storage.database.search_query_stats_manager import SearchQueryStatsManager
+
+            db = get_session()
+            try:
+                SearchQueryStatsManager().record_yields(db, list(query_yields.values()))
+                print(f"已记录 {len(query_yields)} 个查询的收益统计")
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"记录查询收益统计失败: {str(e)}")
 
     # 8. 最终结果处理：根据数量范围决定发送哪些新闻
     print("\n" + "=" * 80)
@@ -1292,35 +1186,70 @@ def search_until_10_node(state: SearchUntil10Input, config: RunnableConfig, runt
     print(f"发送数量范围: {min_target}-{max_target} 条")
     print("=" * 80)
 
-    # 根据数量范围决定发送哪些新闻
+    # 各有效新闻的发文日期，计算水位线时使用（之后的过滤与合并会从累积列表中移除新闻）
+    news_dates = {news.url: news.date for news in all_deduplicated_news}
+
+    # 根据数量范围决定发送哪些新闻：所有专题合计按接收顺序取前 max_target 条，再按专题划分
     total_news = len(all_deduplicated_news)
+    news_to_send = all_deduplicated_news[:max_target]
+    profile_news_urls = {
+        name: [news.url for news in news_to_send if name in news_profiles.get(news.url, [])]
+        for name in profile_names
+    }
+
+    # 事件聚类：同一事件的多家媒体报道只保留一条代表新闻参与摘要生成，其余链接作为备选来源
+    if STORY_CLUSTER_ENABLED and total_news >= min_target:
+        news_to_send, merged_urls = collapse_stories(news_to_send)
+        if merged_urls:
+            for news in news_to_send:
+                if news.alternate_urls:
+                    print(f"  同一事件合并: {news.title}（另有 {len(news.alternate_urls)} 个来源）")
+            for name, urls in profile_news_urls.items():
+                profile_news_urls[name] = list(dict.fromkeys(merged_urls.get(url, url) for url in urls))
+            all_deduplicated_news = [news for news in all_deduplicated_news if news.url not in merged_urls]
+            total_news = len(all_deduplicated_news)
+            print(f"事件聚类: 合并 {len(merged_urls)} 条，剩余 {len(news_to_send)} 个事件")
+    saved_note = f"，提前终止节省 {saved_search_calls} 次搜索调用" if saved_search_calls else ""
+    plan_sites = set(plan.sites_summary())
+    tripped = [f"{key}({state['state']})" for key, state in get_breaker_registry().snapshot().items()
+               if key in plan_sites and state["state"] != "closed"]
+    if tripped:
+        saved_note += f"，熔断站点批次: {', '.join(tripped)}"
+    if len(profile_names) > 1:
+        saved_note += "，专题: " + "、".join(f"{name} {len(urls)} 条" for name, urls in profile_news_urls.items())
+
+    # 水位线只推进到实际发送的新闻，超出上限或被过滤、合并的新闻下次仍在搜索时间范围内
+    query_watermarks = delivered_watermarks(query_news_urls, news_dates, {news.url for news in news_to_send})
 
     if total_news < min_target:
         # 数量 < 5，不发送
         print(f"❌ 新闻数量不足 ({total_news} < {min_target})，不发送邮件")
-        message = f"搜索完成，共 {search_count} 次搜索，仅获取 {total_news} 条新闻（最少需要{min_target}条），不发送邮件"
+        message = f"搜索完成，共 {search_count} 次搜索，仅获取 {total_news} 条新闻（最少需要{min_target}条），不发送邮件{saved_note}"
         return SearchUntil10Output(
             filtered_news_list=[],  # 返回空列表
             deduplicated_news_list=[],  # 返回空列表
             message=message
         )
-    elif total_news <= max_target:
+    elif len(news_to_send) == total_news:
         # 5 ≤ 数量 ≤ 20，全部发送
         print(f"✅ 新闻数量在范围内 ({total_news})，全部发送")
-        message = f"搜索完成，共 {search_count} 次搜索，获取 {total_news} 条新闻，全部发送"
+        message = f"搜索完成，共 {search_count} 次搜索，获取 {total_news} 条新闻，全部发送{saved_note}"
         return SearchUntil10Output(
-            filtered_news_list=all_deduplicated_news,
-            deduplicated_news_list=all_deduplicated_news,
+            filtered_news_list=news_to_send,
+            deduplicated_news_list=news_to_send,
+            query_watermarks=query_watermarks,
+            profile_news_urls=profile_news_urls,
             message=message
         )
     else:
         # 数量 > 20，只发送前20条
-        news_to_send = all_deduplicated_news[:max_target]
-        print(f"✅ 新闻数量超过最大值 ({total_news} > {max_target})，只发送前 {max_target} 条")
-        message = f"搜索完成，共 {search_count} 次搜索，获取 {total_news} 条新闻，本次发送前 {max_target} 条"
+        print(f"✅ 新闻数量超过最大值 ({total_news} > {max_target})，只发送前 {max_target} 条，共 {len(news_to_send)} 条")
+        message = f"搜索完成，共 {search_count} 次搜索，获取 {total_news} 条新闻，本次发送 {len(news_to_send)} 条{saved_note}"
         return SearchUntil10Output(
             filtered_news_list=news_to_send,  # 只发送前20条
             deduplicated_news_list=news_to_send,
+            query_watermarks=query_watermarks,
+            profile_news_urls=profile_news_urls,
             message=message
         )
 
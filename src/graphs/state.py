@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -6,12 +6,16 @@ class NewsItem(BaseModel):
     """新闻数据模型"""
     title: str = Field(..., description="新闻标题")
     date: str = Field(..., description="新闻发布日期")
-    url: str = Field(..., description="新闻链接")
+    url: str = Field(..., description="新闻链接（规范化后的去重键）")
+    original_url: str = Field(default="", description="搜索结果中的原始链接（邮件与表格中展示）")
     summary: str = Field(..., description="新闻摘要")
     content: str = Field(default="", description="新闻正文")
     source: str = Field(default="", description="新闻来源")
     region: str = Field(default="", description="地区")
     keywords: List[str] = Field(default=[], description="关键词列表")
+    alternate_urls: List[str] = Field(default=[], description="同一事件其他媒体报道的链接")
+    content_tokens: int = Field(default=0, description="正文 token 数")
+    prompt_content_tokens: int = Field(default=0, description="截取后进入丰富提示词的正文 token 数")
 
 
 class GlobalState(BaseModel):
@@ -34,6 +38,12 @@ class GlobalState(BaseModel):
     # history_urls: set = Field(default=set(), description="历史新闻URL集合")
     # history_titles: set = Field(default=set(), description="历史新闻标题集合")
     
+    # 增量搜索：各查询本次可推进到的水位线日期（只计实际发送的新闻），邮件发送成功并保存历史记录后推进
+    query_watermarks: Dict[str, str] = Field(default={}, description="各查询可推进到的水位线日期")
+
+    # 多专题：各专题划分到的新闻URL（专题名 -> URL列表），用于按专题发送邮件
+    profile_news_urls: Dict[str, List[str]] = Field(default={}, description="各专题的新闻URL列表")
+
     # 结果
     synced_count: int = Field(default=0, description="创建的新闻记录数")
     email_sent: bool = Field(default=False, description="邮件是否发送成功")
@@ -121,6 +131,7 @@ class SendEmailInput(BaseModel):
     enriched_news_list: List[NewsItem] = Field(..., description="新闻列表")
     table_filepath: str = Field(..., description="表格文件路径")
     table_filename: str = Field(..., description="表格文件名")
+    profile_news_urls: Dict[str, List[str]] = Field(default={}, description="各专题的新闻URL列表（按专题发送邮件）")
 
 
 class SendEmailOutput(BaseModel):
@@ -132,6 +143,8 @@ class SendEmailOutput(BaseModel):
 class SaveNewsHistoryInput(BaseModel):
     """保存新闻历史记录节点的输入"""
     enriched_news_list: List[NewsItem] = Field(..., description="需要保存到数据库的新闻列表")
+    query_watermarks: Dict[str, str] = Field(default={}, description="各查询可推进到的水位线日期（用于推进搜索水位线）")
+    email_sent: bool = Field(default=False, description="邮件是否发送成功（发送失败时不推进搜索水位线）")
 
 
 class SaveNewsHistoryOutput(BaseModel):
@@ -203,4 +216,6 @@ class SearchUntil10Output(BaseModel):
     """循环搜索5-20条新闻节点的输出（最多发送20条）"""
     filtered_news_list: List[NewsItem] = Field(default=[], description="过滤后的新闻列表（近3个月内，最多20条）")
     deduplicated_news_list: List[NewsItem] = Field(default=[], description="去重后的新闻列表（去除历史重复，最多20条）")
+    query_watermarks: Dict[str, str] = Field(default={}, description="各查询可推进到的水位线日期")
+    profile_news_urls: Dict[str, List[str]] = Field(default={}, description="各专题的新闻URL列表")
     message: str = Field(..., description="执行结果消息")
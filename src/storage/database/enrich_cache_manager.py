@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from storage.database.shared.model import NewsEnrichCache
+
+
+class EnrichCacheManager:
+    """新闻丰富结果缓存管理器"""
+
+    def get_results(self, db: Session, cache_keys: List[str], ttl_days: int) -> Dict[str, Dict[str, Any]]:
+        """
+        批量获取未过期的丰富结果
+        返回: {cache_key: result}
+        """
+        if not cache_keys:
+            return {}
+        since = datetime.now(timezone.utc) - timedelta(days=ttl_days)
+        rows = db.query(NewsEnrichCache.cache_key, NewsEnrichCache.result).filter(
+            NewsEnrichCache.cache_key.in_(cache_keys),
+            NewsEnrichCache.created_at >= since
+        ).all()
+        return {row[0]: row[1] for row in rows}
+
+    def save_results(self, db: Session, results: Dict[str, Dict[str, Any]], model: str, prompt_version: str) -> int:
+        """
+        保存丰富结果，已存在的缓存键覆盖结果并刷新创建时间
+        postgresql/sqlite 使用单条 upsert，并发运行写入同一缓存键时不会因唯一约束导致整批失败
+        返回: 保存的记录数
+        """
+        if not results:
+            return 0
+        now = datetime.now(timezone.utc)
+        rows = [
+            {"cache_key": key, "model": model, "prompt_version": prompt_version, "result": result, "created_at": now}
+            for key, result in results.items()
+        ]
+        dialect = db.get_bind().dialect.name
+        try:
+            if dialect in ("postgresql", "sqlite"):
+                insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+                stmt = insert(NewsEnrichCache).values(rows)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[NewsEnrichCache.cache_key],
+                    set_={
+                        "model": stmt.excluded.model,
+                        "prompt_version": stmt.excluded.prompt_version,
+                        "result": stmt.excluded.result,
+                        "created_at": stmt.excluded.created_at,
+                    }
+                )
+                db.execute(stmt)
+                db.commit()
+            else:
+                self._save_rows(db, rows)
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            raise Exception(f"保存新闻丰富缓存失败: {str(e)}")
+
+    def _save_rows(self, db: Session, rows: List[Dict[str, Any]]):
+        """不支持 upsert 的数据库：先整批写入，遇到唯一约束冲突时回滚并逐条覆盖写入"""
+        existing = {
+            row.cache_key: row for row in
+            db.query(NewsEnrichCache).filter(NewsEnrichCache.cache_key.in_([r["cache_key"] for r in rows])).all()
+        }
+        for r in rows:
+            row = existing.get(r["cache_key"])
+            if row is None:
+                db.add(NewsEnrichCache(**r))
+            else:
+                row.result = r["result"]
+                row.created_at = r["created_at"]
+        try:
+            db.commit()
+            return
+        except IntegrityError:
+            db.rollback()
+        for r in rows:
+            row = db.query(NewsEnrichCache).filter(NewsEnrichCache.cache_key == r["cache_key"]).first()
+            if row is None:
+                db.add(NewsEnrichCache(**r))
+            else:
+                row.result = r["result"]
+                row.created_at = r["created_at"]
+            try:
+                db.commit()
+            except IntegrityError:
+                # 并发写入的结果与本次等价，跳过该条
+                db.rollback()
+
+    def delete_expired(self, db: Session, ttl_days: int) -> int:
+        """
+        删除过期的丰富结果
+        返回: 删除的记录数
+        """
+        since = datetime.now(timezone.utc) - timedelta(days=ttl_days)
+        try:
+            deleted = db.query(NewsEnrichCache).filter(NewsEnrichCache.created_at < since).delete(synchronize_session=False)
+            db.commit()
+            return deleted
+        except Exception as e:
+            db.rollback()
+            raise Exception(f"清理新闻丰富缓存失败: {str(e)}")
@@ -0,0 +1,223 @@
+"""
+历史新闻指纹集合 - URL/标题的 64 位 xxhash 指纹存为有序 uint64 数组，快照到磁盘后以内存映射方式加载，
+按主键增量刷新，已删除记录累计到一定比例后全量重建；指纹命中只表示“可能已发送”，由数据库精确确认
+"""
+import os
+import time
+import logging
+import threading
+from typing import Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import xxhash
+from sqlalchemy.orm import Session
+
+from storage.database.news_history_manager import NewsHistoryManager
+from utils.news.title_norm import normalize_title
+from utils.news.url_canon import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FINGERPRINTS_ENABLED = os.getenv("HISTORY_FINGERPRINTS", "1") == "1"
+HISTORY_FINGERPRINT_PATH = os.getenv("HISTORY_FINGERPRINT_PATH", "/tmp/medical_news_cache/history_fingerprints.npy")
+# 快照中已删除记录的比例超过该值时全量重建（残留指纹只会多一次数据库确认，无需每次清理都重建）
+HISTORY_FINGERPRINT_STALE_RATIO = float(os.getenv("HISTORY_FINGERPRINT_STALE_RATIO", "0.2"))
+# 快照最长使用时间（小时），超过后全量重建；默认 0 不按时间重建
+HISTORY_FINGERPRINT_REBUILD_HOURS = float(os.getenv("HISTORY_FINGERPRINT_REBUILD_HOURS", "0"))
+
+# 快照布局（单个 uint64 数组，整体原子替换）：
+# [版本, 已收录的最大主键ID, URL指纹数, 已收录的记录数, 全量构建时间, URL指纹..., 标题指纹...]
+_SNAPSHOT_VERSION = 4
+_HEADER_SIZE = 5
+_EMPTY = np.empty(0, dtype=np.uint64)
+
+
+def canonical_url(url: str) -> str:
+    return canonicalize_url(url)
+
+
+def canonical_title(title: str) -> str:
+    return normalize_title(title)
+
+
+def fingerprint(text: str) -> int:
+    return xxhash.xxh64_intdigest(text.encode('utf-8'))
+
+
+def _fingerprint_array(texts: Iterable[str]) -> np.ndarray:
+    """计算指纹并返回有序去重的 uint64 数组"""
+    values = np.fromiter((fingerprint(t) for t in texts if t), dtype=np.uint64)
+    return np.unique(values)
+
+
+def _contains(sorted_fps: np.ndarray, fps: np.ndarray) -> np.ndarray:
+    """返回 fps 中每个指纹是否出现在有序数组 sorted_fps 中"""
+    if not len(sorted_fps) or not len(fps):
+        return np.zeros(len(fps), dtype=bool)
+    pos = np.searchsorted(sorted_fps, fps)
+    pos[pos == len(sorted_fps)] = 0
+    return sorted_fps[pos] == fps
+
+
+class HistoryFingerprints:
+    """
+    历史新闻指纹集合（线程安全）
+
+    - 快照以内存映射方式打开，加载耗时与常驻内存不随历史记录增长
+    - refresh() 只读取主键大于快照水位的新记录，合并后原子替换快照
+    - 以下情况全量重建，避免已删除记录的指纹无限累积：
+      已删除的记录（如 delete_old_news 清理的旧记录）超过快照已收录记录数的 HISTORY_FINGERPRINT_STALE_RATIO、
+      记录被清空或回退（最大主键小于快照水位）、设置了 HISTORY_FINGERPRINT_REBUILD_HOURS 且快照已超时
+    """
+
+    def __init__(self, path: str = HISTORY_FINGERPRINT_PATH):
+        self.path = path
+        self.max_id = 0
+        self.rows = 0
+        self.built_at = 0
+        self._urls = _EMPTY
+        self._titles = _EMPTY
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            snapshot = np.load(self.path, mmap_mode='r')
+            if len(snapshot) < _HEADER_SIZE or int(snapshot[0]) != _SNAPSHOT_VERSION:
+                logger.warning(f"history fingerprint snapshot ignored (unknown layout): {self.path}")
+                return
+            n_urls = int(snapshot[2])
+            self.max_id = int(snapshot[1])
+            self.rows = int(snapshot[3])
+            self.built_at = int(snapshot[4])
+            self._urls = snapshot[_HEADER_SIZE:_HEADER_SIZE + n_urls]
+            self._titles = snapshot[_HEADER_SIZE + n_urls:]
+        except Exception as e:
+            logger.warning(f"history fingerprint snapshot load failed: {e}")
+            self.max_id, self.rows, self.built_at, self._urls, self._titles = 0, 0, 0, _EMPTY, _EMPTY
+
+    def _save(self, urls: np.ndarray, titles: np.ndarray, max_id: int, rows: int, built_at: int):
+        header = np.array([_SNAPSHOT_VERSION, max_id, len(urls), rows, built_at], dtype=np.uint64)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as fd:
+            np.save(fd, np.concatenate([header, urls, titles]))
+        os.replace(tmp_path, self.path)
+
+    def refresh(self, db: Session) -> int:
+        """从数据库增量刷新指纹快照，返回新收录的记录数"""
+        mgr = NewsHistoryManager()
+        with self._lock:
+            expired = HISTORY_FINGERPRINT_REBUILD_HOURS > 0 and \
+                time.time() - self.built_at > HISTORY_FINGERPRINT_REBUILD_HOURS * 3600
+            stale = self.rows - mgr.get_total_count(db) > self.rows * HISTORY_FINGERPRINT_STALE_RATIO
+            rebuild = expired or stale or mgr.get_max_id(db) < self.max_id
+            after_id = 0 if rebuild else self.max_id
+            rows = mgr.get_rows_after(db, after_id)
+            if not rows and not rebuild:
+                return 0
+            new_urls = _fingerprint_array(canonical_url(row[1]) for row in rows)
+            new_titles = _fingerprint_array(canonical_title(row[2]) for row in rows)
+            if rebuild:
+                urls, titles = new_urls, new_titles
+                total_rows, built_at = len(rows), int(time.time())
+                logger.info(f"history fingerprint snapshot rebuilt: {len(rows)} rows (was {self.rows})")
+            else:
+                urls = np.union1d(self._urls, new_urls)
+                titles = np.union1d(self._titles, new_titles)
+                total_rows, built_at = self.rows + len(rows), self.built_at
+            max_id = rows[-1][0] if rows else 0
+            try:
+                self._save(urls, titles, max_id, total_rows, built_at)
+                self.max_id = max_id
+                self._load()
+            except Exception as e:
+                # 快照写入失败时仍使用内存中的结果
+                logger.warning(f"history fingerprint snapshot save failed: {e}")
+                self.max_id, self.rows, self.built_at, self._urls, self._titles = max_id, total_rows, built_at, urls, titles
+            return len(rows)
+
+    def probable_hits(self, urls: List[str], titles: List[str]) -> Tuple[List[str], List[str]]:
+        """返回指纹命中（可能已存在）的URL与标题"""
+        with self._lock:
+            url_fps, title_fps = self._urls, self._titles
+        url_mask = _contains(url_fps, np.array([fingerprint(canonical_url(u)) for u in urls], dtype=np.uint64))
+        title_mask = _contains(title_fps, np.array([fingerprint(canonical_title(t)) for t in titles], dtype=np.uint64))
+        return ([u for u, hit in zip(urls, url_mask) if hit],
+                [t for t, hit in zip(titles, title_mask) if hit])
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+
+class HistoryLookup:
+    """
+    历史去重查询：先用指纹集合预筛，可能命中的候选再一次查询数据库精确确认；
+    未启用指纹集合时所有候选都交给数据库确认。
+    数据库确认为单次集合查询（NewsHistoryManager.find_existing），开销只与候选数量有关。
+    """
+
+    def __init__(self, fingerprints: Optional[HistoryFingerprints] = None):
+        self.fingerprints = fingerprints
+        self.stats = {"candidates": 0, "probable": 0, "confirmed": 0, "db_queries": 0, "errors": 0}
+
+    def existing(self, urls: List[str], titles: List[str]) -> Tuple[Set[str], Set[str]]:
+        """返回候选中已存在于历史记录的 (URL集合, 标题集合)；数据库确认失败时按不存在处理（与历史记录不可用时一致）"""
+        urls = list(dict.fromkeys(u for u in urls if u))
+        titles = list(dict.fromkeys(t for t in titles if t))
+        self.stats["candidates"] += len(urls) + len(titles)
+        if self.fingerprints is not None:
+            probable_urls, probable_titles = self.fingerprints.probable_hits(urls, titles)
+        else:
+            probable_urls, probable_titles = urls, titles
+        self.stats["probable"] += len(probable_urls) + len(probable_titles)
+        if not probable_urls and not probable_titles:
+            return set(), set()
+
+        from storage.database.db import get_session
+        try:
+            db = get_session()
+            try:
+                self.stats["db_queries"] += 1
+                found_urls, found_titles = NewsHistoryManager().find_existing(db, probable_urls, probable_titles)
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning(f"history lookup failed: {e}")
+            self.stats["errors"] += 1
+            return set(), set()
+        self.stats["confirmed"] += len(found_urls) + len(found_titles)
+        return found_urls, found_titles
+
+
+_fingerprints: Optional[HistoryFingerprints] = None
+_fingerprints_lock = threading.Lock()
+
+
+def get_history_fingerprints() -> HistoryFingerprints:
+    """获取进程级共享的历史新闻指纹集合"""
+    global _fingerprints
+    if _fingerprints is None:
+        with _fingerprints_lock:
+            if _fingerprints is None:
+                _fingerprints = HistoryFingerprints()
+    return _fingerprints
+
+
+def load_history_lookup() -> HistoryLookup:
+    """增量刷新指纹快照并返回历史去重查询"""
+    from storage.database.db import get_session
+
+    if not HISTORY_FINGERPRINTS_ENABLED:
+        return HistoryLookup()
+    fingerprints = get_history_fingerprints()
+    start = time.time()
+    db = get_session()
+    try:
+        added = fingerprints.refresh(db)
+    finally:
+        db.close()
+    logger.info(f"history fingerprints refreshed: +{added}, total {len(fingerprints)}, {time.time() - start:.2f}s")
+    return HistoryLookup(fingerprints)
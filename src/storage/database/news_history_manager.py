@@ -1,10 +1,16 @@
-from typing import List, Optional
+import os
+import datetime
+from typing import List, Optional, Set, Tuple
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from sqlalchemy import String, or_, and_, any_, bindparam, func, text
+from sqlalchemy.dialects.postgresql import ARRAY
 
 from storage.database.shared.model import NewsHistory
 
+# 候选数量达到该值时改用临时表连接（避免超大数组参数）
+FIND_EXISTING_TEMP_TABLE_MIN = int(os.getenv("HISTORY_LOOKUP_TEMP_TABLE_MIN", "2000"))
+
 
 class NewsHistoryCreate(BaseModel):
     """创建新闻历史记录的输入模型"""
@@ -68,6 +74,81 @@ class NewsHistoryManager:
         news_list = db.query(NewsHistory.title).all()
         return {news[0] for news in news_list}
 
+    def get_rows_after(self, db: Session, after_id: int = 0) -> List[Tuple[int, str, str]]:
+        """
+        获取主键大于 after_id 的历史新闻 (ID, URL, 标题)，按ID升序，用于增量刷新指纹快照
+        """
+        rows = db.query(NewsHistory.id, NewsHistory.url, NewsHistory.title).filter(
+            NewsHistory.id > after_id
+        ).order_by(NewsHistory.id).all()
+        return [(row[0], row[1], row[2]) for row in rows]
+
+    def get_max_id(self, db: Session) -> int:
+        """
+        获取当前最大主键ID（无记录时为0）
+        """
+        return db.query(func.max(NewsHistory.id)).scalar() or 0
+
+    def find_existing(self, db: Session, urls: List[str], titles: List[str]) -> Tuple[Set[str], Set[str]]:
+        """
+        一次查询返回候选URL与标题中已存在于历史记录的部分，开销只与候选数量有关
+        - PostgreSQL：url = ANY(:urls) OR title = ANY(:titles)（数组参数，语句与候选数量无关）
+        - 候选数量很大时：写入临时表后与历史表按URL、标题分别连接
+        - 其他数据库：IN 查询
+        返回: (已存在的URL集合, 已存在的标题集合)
+        """
+        urls = list(set(urls))
+        titles = list(set(titles))
+        if not urls and not titles:
+            return set(), set()
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql" and len(urls) + len(titles) >= FIND_EXISTING_TEMP_TABLE_MIN:
+            rows = self._find_existing_by_temp_table(db, urls, titles)
+        elif dialect == "postgresql":
+            rows = db.query(NewsHistory.url, NewsHistory.title).filter(
+                or_(
+                    NewsHistory.url == any_(bindparam("urls", value=urls, type_=ARRAY(String))),
+                    NewsHistory.title == any_(bindparam("titles", value=titles, type_=ARRAY(String))),
+                )
+            ).all()
+        else:
+            rows = db.query(NewsHistory.url, NewsHistory.title).filter(
+                or_(NewsHistory.url.in_(urls), NewsHistory.title.in_(titles))
+            ).all()
+        url_set, title_set = set(urls), set(titles)
+        return ({row[0] for row in rows if row[0] in url_set},
+                {row[1] for row in rows if row[1] in title_set})
+
+    def _find_existing_by_temp_table(self, db: Session, urls: List[str], titles: List[str]) -> list:
+        """候选写入事务级临时表，URL与标题分别走各自的索引连接后合并"""
+        db.execute(text(
+            "CREATE TEMP TABLE IF NOT EXISTS news_history_candidates (kind SMALLINT NOT NULL, value TEXT NOT NULL)"
+            " ON COMMIT DELETE ROWS"
+        ))
+        try:
+            db.execute(
+                text("INSERT INTO news_history_candidates (kind, value) VALUES (:kind, :value)"),
+                [{"kind": 0, "value": url} for url in urls] + [{"kind": 1, "value": title} for title in titles]
+            )
+            return db.execute(text(
+                "SELECT h.url, h.title FROM news_history h"
+                " JOIN news_history_candidates c ON c.kind = 0 AND h.url = c.value"
+                " UNION "
+                "SELECT h.url, h.title FROM news_history h"
+                " JOIN news_history_candidates c ON c.kind = 1 AND h.title = c.value"
+            )).all()
+        finally:
+            # 只读查询，回滚即清空临时表中的候选
+            db.rollback()
+
+    def get_recent_titles(self, db: Session, days: int = 30) -> List[Tuple[str, str]]:
+        """
+        获取最近指定天数内发送过的新闻 (URL, 标题)，用于近似重复检测
+        """
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+        rows = db.query(NewsHistory.url, NewsHistory.title).filter(NewsHistory.sent_at >= cutoff).all()
+        return [(row[0], row[1]) for row in rows]
+
     def exists_by_url(self, db: Session, url: str) -> bool:
         """
         检查URL是否已存在
@@ -0,0 +1,64 @@
+from typing import Dict, List
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+
+from storage.database.shared.model import SearchQueryStats
+
+# 指数移动平均的平滑系数，越大越偏重最近几次运行
+EMA_ALPHA = 0.3
+
+
+class QueryYield(BaseModel):
+    """单次运行中一个查询的产出"""
+    query_key: str = Field(..., description="查询键（站点批次::搜索词）")
+    raw_items: int = Field(default=0, description="返回条数")
+    survivors: int = Field(default=0, description="通过日期过滤与历史去重的条数")
+
+
+class SearchQueryStatsManager:
+    """搜索查询收益统计管理器"""
+
+    def get_stats(self, db: Session, query_keys: List[str]) -> Dict[str, SearchQueryStats]:
+        """
+        批量获取查询的收益统计
+        返回: {query_key: SearchQueryStats}
+        """
+        if not query_keys:
+            return {}
+        rows = db.query(SearchQueryStats).filter(SearchQueryStats.query_key.in_(query_keys)).all()
+        return {row.query_key: row for row in rows}
+
+    def record_yields(self, db: Session, yields: List[QueryYield]) -> int:
+        """
+        记录一次运行中各查询的产出，累加计数并更新指数移动平均
+        返回: 更新的记录数
+        """
+        if not yields:
+            return 0
+        existing = self.get_stats(db, [y.query_key for y in yields])
+        for y in yields:
+            hit_rate = y.survivors / y.raw_items if y.raw_items else 0.0
+            row = existing.get(y.query_key)
+            if row is None:
+                row = SearchQueryStats(
+                    query_key=y.query_key,
+                    calls=1,
+                    raw_items=y.raw_items,
+                    survivors=y.survivors,
+                    ema_survivors=float(y.survivors),
+                    ema_hit_rate=hit_rate,
+                )
+                db.add(row)
+                existing[y.query_key] = row
+            else:
+                row.calls += 1
+                row.raw_items += y.raw_items
+                row.survivors += y.survivors
+                row.ema_survivors = EMA_ALPHA * y.survivors + (1 - EMA_ALPHA) * row.ema_survivors
+                row.ema_hit_rate = EMA_ALPHA * hit_rate + (1 - EMA_ALPHA) * row.ema_hit_rate
+        try:
+            db.commit()
+            return len(yields)
+        except Exception as e:
+            db.rollback()
+            raise Exception(f"记录搜索查询收益失败: {str(e)}")
@@ -0,0 +1,89 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+from sqlalchemy.orm import Session
+
+from storage.database.shared.model import SearchWatermark
+
+# 是否启用基于水位线的增量搜索
+SEARCH_INCREMENTAL = os.getenv("SEARCH_INCREMENTAL", "1") == "1"
+# 增量窗口与上次成功运行的重叠天数（重叠部分由历史去重兜底）
+SEARCH_WATERMARK_OVERLAP_DAYS = int(os.getenv("SEARCH_WATERMARK_OVERLAP_DAYS", "1"))
+
+
+def build_time_range(last_success_date: Optional[str], today: datetime, overlap_days: int, max_days: int) -> str:
+    """
+    根据水位线计算搜索的发文时间范围（YYYY-MM-DD..YYYY-MM-DD）
+    起始日期为 水位线 - 重叠天数，且不早于 今天 - max_days
+    """
+    earliest = today - timedelta(days=max_days)
+    start = earliest
+    if last_success_date:
+        try:
+            start = max(earliest, datetime.strptime(last_success_date, '%Y-%m-%d') - timedelta(days=overlap_days))
+        except ValueError:
+            start = earliest
+    return f"{start.strftime('%Y-%m-%d')}..{today.strftime('%Y-%m-%d')}"
+
+
+def delivered_watermarks(query_news_urls: Dict[str, List[str]], news_dates: Dict[str, str],
+                         sent_urls: Set[str]) -> Dict[str, str]:
+    """
+    计算各查询可推进到的水位线：只到该查询实际发送的最新一条新闻的日期，
+    且不晚于该查询未发送的有效新闻（超出发送上限、被合并或近似重复过滤）中最早的日期，下次搜索仍能覆盖它们；
+    没有发送任何新闻的查询不推进
+    """
+    watermarks = {}
+    for key, urls in query_news_urls.items():
+        sent_dates = [news_dates[url] for url in urls if url in sent_urls and url in news_dates]
+        if not sent_dates:
+            continue
+        watermark = max(sent_dates)
+        unsent_dates = [news_dates[url] for url in urls if url not in sent_urls and url in news_dates]
+        if unsent_dates:
+            watermark = min(watermark, min(unsent_dates))
+        watermarks[key] = watermark
+    return watermarks
+
+
+class SearchWatermarkManager:
+    """搜索水位线管理器 - 读取和推进每个查询的最近成功运行日期"""
+
+    def get_watermarks(self, db: Session, query_keys: List[str]) -> Dict[str, str]:
+        """
+        批量获取查询的水位线
+        返回: {query_key: last_success_date}
+        """
+        if not query_keys:
+            return {}
+        rows = db.query(SearchWatermark.query_key, SearchWatermark.last_success_date).filter(
+            SearchWatermark.query_key.in_(query_keys)
+        ).all()
+        return {row[0]: row[1] for row in rows}
+
+    def advance_watermarks(self, db: Session, watermarks: Dict[str, str]) -> int:
+        """
+        将各查询的水位线推进到给定日期（只前进不后退）
+        返回: 更新或新建的记录数
+        """
+        if not watermarks:
+            return 0
+        existing = {
+            row.query_key: row for row in
+            db.query(SearchWatermark).filter(SearchWatermark.query_key.in_(list(watermarks))).all()
+        }
+        changed = 0
+        for key, run_date in watermarks.items():
+            row = existing.get(key)
+            if row is None:
+                db.add(SearchWatermark(query_key=key, last_success_date=run_date))
+                changed += 1
+            elif row.last_success_date < run_date:
+                row.last_success_date = run_date
+                changed += 1
+        try:
+            db.commit()
+            return changed
+        except Exception as e:
+            db.rollback()
+            raise Exception(f"更新搜索水位线失败: {str(e)}")
@@ -24,6 +24,55 @@ class NewsHistory(Base):
     # 索引
     __table_args__ = (
         Index("ix_news_history_url", "url"),
+        Index("ix_news_history_title", "title"),
         Index("ix_news_history_sent_at", "sent_at"),
     )
 
+
+class SearchWatermark(Base):
+    """搜索水位线表 - 记录每个查询（站点批次+搜索词）最近一次成功运行的日期，用于增量搜索"""
+    __tablename__ = "search_watermark"
+
+    id = Column(Integer, primary_key=True, comment="主键ID")
+    query_key = Column(String(512), unique=True, nullable=False, comment="查询键（站点批次::搜索词）")
+    last_success_date = Column(String(32), nullable=False, comment="最近一次成功运行日期（YYYY-MM-DD）")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False, comment="更新时间")
+
+    __table_args__ = (
+        Index("ix_search_watermark_query_key", "query_key"),
+    )
+
+
+class SearchQueryStats(Base):
+    """搜索查询收益统计表 - 记录每个查询（站点批次+搜索词）的调用次数与有效新闻产出，用于自适应调度"""
+    __tablename__ = "search_query_stats"
+
+    id = Column(Integer, primary_key=True, comment="主键ID")
+    query_key = Column(String(512), unique=True, nullable=False, comment="查询键（站点批次::搜索词）")
+    calls = Column(Integer, nullable=False, default=0, comment="累计调用次数")
+    raw_items = Column(Integer, nullable=False, default=0, comment="累计返回条数")
+    survivors = Column(Integer, nullable=False, default=0, comment="累计通过日期过滤与历史去重的条数")
+    ema_survivors = Column(Float, nullable=False, default=0.0, comment="每次调用有效条数的指数移动平均")
+    ema_hit_rate = Column(Float, nullable=False, default=0.0, comment="有效条数占返回条数比例的指数移动平均")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False, comment="更新时间")
+
+    __table_args__ = (
+        Index("ix_search_query_stats_query_key", "query_key"),
+    )
+
+
+class NewsEnrichCache(Base):
+    """新闻丰富结果缓存表 - 按 (模型, 提示词版本, 标题, 正文) 的哈希缓存大语言模型生成的摘要、来源、地区和关键词"""
+    __tablename__ = "news_enrich_cache"
+
+    id = Column(Integer, primary_key=True, comment="主键ID")
+    cache_key = Column(String(64), unique=True, nullable=False, comment="缓存键（sha256）")
+    model = Column(String(128), nullable=False, comment="模型名称")
+    prompt_version = Column(String(64), nullable=False, comment="提示词版本")
+    result = Column(JSON, nullable=False, comment="丰富结果（summary、source、region、keywords）")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, comment="记录创建时间")
+
+    __table_args__ = (
+        Index("ix_news_enrich_cache_cache_key", "cache_key"),
+        Index("ix_news_enrich_cache_created_at", "created_at"),
+    )
@@ -0,0 +1,140 @@
+"""
+按站点批次的熔断器 - 连续失败或持续高延迟时熔断该批次一段冷却时间，并记录延迟分布用于对冲请求
+"""
+import os
+import time
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+# 连续失败（含慢调用）达到该次数后熔断
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("SEARCH_BREAKER_FAILURES", "3"))
+# 单次调用超过该耗时（秒）视为慢调用，计入失败次数
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("SEARCH_BREAKER_SLOW_SECONDS", "20"))
+# 熔断冷却时间（秒），冷却结束后放行一次试探调用
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("SEARCH_BREAKER_COOLDOWN", "120"))
+# 用于计算延迟分位数的最近样本数
+LATENCY_WINDOW = 50
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """站点批次处于熔断状态，调用被跳过"""
+
+
+class CircuitBreaker:
+    """单个站点批次的熔断器（线程安全）"""
+
+    def __init__(
+            self,
+            failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+            slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS,
+            cooldown_seconds: float = BREAKER_COOLDOWN_SECONDS,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.skipped = 0
+        self._trial_in_flight = False
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """是否放行一次调用；熔断冷却结束后只放行一个试探调用"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.skipped += 1
+            return False
+
+    def record_success(self, elapsed: float):
+        with self._lock:
+            self._latencies.append(elapsed)
+            self._trial_in_flight = False
+            if elapsed > self.slow_call_seconds:
+                self._on_failure()
+            else:
+                self.state = CLOSED
+                self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._trial_in_flight = False
+            self._on_failure()
+
+    def _on_failure(self):
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def percentile(self, q: float) -> Optional[float]:
+        """最近成功调用的延迟分位数，样本不足时返回 None"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        idx = min(len(samples) - 1, int(round(q * (len(samples) - 1))))
+        return samples[idx]
+
+    def sample_count(self) -> int:
+        with self._lock:
+            return len(self._latencies)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            remaining = 0.0
+            if self.state == OPEN:
+                remaining = max(0.0, self.cooldown_seconds - (time.monotonic() - self.opened_at))
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "skipped": self.skipped,
+                "cooldown_remaining": round(remaining, 1),
+            }
+
+
+class BreakerRegistry:
+    """按站点批次管理熔断器"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker()
+                self._breakers[key] = breaker
+            return breaker
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            items = list(self._breakers.items())
+        return {key: breaker.snapshot() for key, breaker in items}
+
+
+_registry: Optional[BreakerRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_breaker_registry() -> BreakerRegistry:
+    """获取进程级共享的熔断器注册表（熔断状态跨运行保留）"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = BreakerRegistry()
+    return _registry
@@ -0,0 +1,175 @@
+"""
+新闻丰富结果缓存 - 按 (模型, 提示词版本, 标题, 正文) 的哈希缓存大语言模型的丰富结果，带 TTL 淘汰；
+默认存入数据库（与 news_history 同库），单机部署可改用本地 sqlite。
+每批结果生成后立即写入，运行中断后重跑只需请求尚未完成的新闻
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+ENRICH_CACHE_ENABLED = os.getenv("ENRICH_CACHE_ENABLED", "1") == "1"
+# 存储后端：database（PGDATABASE_URL 对应的数据库）或 sqlite（本地文件）
+ENRICH_CACHE_BACKEND = os.getenv("ENRICH_CACHE_BACKEND", "database")
+ENRICH_CACHE_PATH = os.getenv("ENRICH_CACHE_PATH", "/tmp/medical_news_cache/enrich_cache.sqlite3")
+# 缓存有效期（天）：覆盖因数量不足未发送、隔几天再次出现的新闻
+ENRICH_CACHE_TTL_DAYS = int(os.getenv("ENRICH_CACHE_TTL_DAYS", "7"))
+
+
+def make_enrich_cache_key(model: str, prompt_version: str, title: str, content: str) -> str:
+    raw = orjson.dumps([model, prompt_version, title, content])
+    return hashlib.sha256(raw).hexdigest()
+
+
+class EnrichResultCache:
+    """
+    新闻丰富结果缓存（线程安全），缓存内容为 summary、source、region、keywords 字典
+
+    读写失败时只记录日志并按未命中处理，不影响新闻丰富
+    """
+
+    def __init__(self, backend: str = ENRICH_CACHE_BACKEND, path: str = ENRICH_CACHE_PATH,
+                 ttl_days: int = ENRICH_CACHE_TTL_DAYS):
+        self.backend = backend
+        self.path = path
+        self.ttl_days = ttl_days
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS news_enrich_cache ("
+                " cache_key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " prompt_version TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " result BLOB NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_news_enrich_cache_created_at ON news_enrich_cache (created_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _incr_stat(self, key: str, value: int = 1):
+        with self._lock:
+            self._stats[key] += value
+
+    def get_many(self, cache_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量查询未过期的丰富结果，返回 {cache_key: result}"""
+        cache_keys = list(dict.fromkeys(cache_keys))
+        if not cache_keys:
+            return {}
+        try:
+            if self.backend == "sqlite":
+                with self._lock:
+                    conn = self._get_conn()
+                    placeholders = ",".join("?" * len(cache_keys))
+                    rows = conn.execute(
+                        f"SELECT cache_key, result FROM news_enrich_cache WHERE cache_key IN ({placeholders}) AND created_at >= ?",
+                        (*cache_keys, time.time() - self.ttl_days * 86400)
+                    ).fetchall()
+                found = {key: orjson.loads(result) for key, result in rows}
+            else:
+                from storage.database.db import get_session
+                from storage.database.enrich_cache_manager import EnrichCacheManager
+
+                db = get_session()
+                try:
+                    found = EnrichCacheManager().get_results(db, cache_keys, self.ttl_days)
+                finally:
+                    db.close()
+        except Exception as e:
+            logger.warning(f"enrich cache read failed: {e}")
+            self._incr_stat("errors")
+            found = {}
+        self._incr_stat("hits", len(found))
+        self._incr_stat("misses", len(cache_keys) - len(found))
+        return found
+
+    def put_many(self, results: Dict[str, Dict[str, Any]], model: str, prompt_version: str):
+        """写入丰富结果（已存在的键覆盖并刷新时间）"""
+        if not results:
+            return
+        try:
+            if self.backend == "sqlite":
+                now = time.time()
+                with self._lock:
+                    conn = self._get_conn()
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO news_enrich_cache (cache_key, model, prompt_version, created_at, result)"
+                        " VALUES (?, ?, ?, ?, ?)",
+                        [(key, model, prompt_version, now, orjson.dumps(result)) for key, result in results.items()]
+                    )
+                    conn.commit()
+            else:
+                from storage.database.db import get_session
+                from storage.database.enrich_cache_manager import EnrichCacheManager
+
+                db = get_session()
+                try:
+                    EnrichCacheManager().save_results(db, results, model, prompt_version)
+                finally:
+                    db.close()
+            self._incr_stat("writes", len(results))
+        except Exception as e:
+            logger.warning(f"enrich cache write failed: {e}")
+            self._incr_stat("errors")
+
+    def evict_expired(self) -> int:
+        """删除过期的丰富结果，返回删除条数"""
+        try:
+            if self.backend == "sqlite":
+                with self._lock:
+                    conn = self._get_conn()
+                    deleted = conn.execute(
+                        "DELETE FROM news_enrich_cache WHERE created_at < ?", (time.time() - self.ttl_days * 86400,)
+                    ).rowcount
+                    conn.commit()
+            else:
+                from storage.database.db import get_session
+                from storage.database.enrich_cache_manager import EnrichCacheManager
+
+                db = get_session()
+                try:
+                    deleted = EnrichCacheManager().delete_expired(db, self.ttl_days)
+                finally:
+                    db.close()
+        except Exception as e:
+            logger.warning(f"enrich cache eviction failed: {e}")
+            self._incr_stat("errors")
+            return 0
+        self._incr_stat("evictions", deleted)
+        return deleted
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_cache: Optional[EnrichResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_enrich_cache() -> EnrichResultCache:
+    """获取进程级共享的新闻丰富结果缓存"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EnrichResultCache()
+    return _cache
@@ -0,0 +1,395 @@
+"""
+新闻丰富运行时 - 每个配置文件只构建一次大语言模型客户端（含 HTTP 连接池）与编译后的提示词模板，
+进程内所有运行与并发请求共享；配置按 (路径, 修改时间) 缓存，文件更新后自动重建
+"""
+import os
+import json
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from jinja2 import Template
+from langchain_openai import ChatOpenAI
+from langchain_core.messages import SystemMessage, HumanMessage
+from coze_coding_utils.runtime_ctx.context import Context, default_headers
+
+from graphs.state import NewsItem
+from tools.enrich_cache import EnrichResultCache, make_enrich_cache_key
+from utils.news.content_budget import TrimmedContent, trim_content
+from utils.news.tokens import count_tokens
+from utils.json_stream import IncrementalJsonParser
+
+ENRICH_DEFAULT_MODEL = "doubao-seed-1-6-251015"
+
+# 丰富结果的字段与允许的类型（keywords 为字符串时按逗号拆分）
+ENRICH_FIELDS = {"summary": (str,), "source": (str,), "region": (str,), "keywords": (list, str)}
+
+
+@dataclass
+class EnrichConfig:
+    """新闻丰富配置（config/enrich_news_llm_cfg.json）"""
+    path: str
+    mtime: float
+    llm_config: Dict[str, Any] = field(default_factory=dict)
+    system_prompt: str = ""
+    user_prompt_template: str = ""
+    # 批量模式：追加到系统提示词后的数组输出说明，以及多条新闻的用户提示词模板
+    batch_system_prompt: str = ""
+    batch_user_prompt_template: str = ""
+
+    @property
+    def model(self) -> str:
+        return self.llm_config.get("model", ENRICH_DEFAULT_MODEL)
+
+    @property
+    def prompt_version(self) -> str:
+        """提示词版本：配置中的 prompt_version，未指定时取各提示词的哈希（修改提示词后缓存自动失效）"""
+        if self.llm_config.get("prompt_version"):
+            return str(self.llm_config["prompt_version"])
+        prompts = "\0".join([self.system_prompt, self.user_prompt_template,
+                             self.batch_system_prompt, self.batch_user_prompt_template])
+        return hashlib.sha256(prompts.encode('utf-8')).hexdigest()[:16]
+
+    @property
+    def max_in_flight(self) -> int:
+        return max(1, int(self.llm_config.get("max_in_flight", 5)))
+
+    @property
+    def batch_size(self) -> int:
+        """每个请求最多打包的新闻数，未配置批量提示词时为 1（逐条请求）"""
+        if not self.batch_user_prompt_template:
+            return 1
+        return max(1, int(self.llm_config.get("batch_size", 1)))
+
+    @property
+    def batch_token_budget(self) -> int:
+        return int(self.llm_config.get("batch_token_budget", 6000))
+
+    @property
+    def json_mode(self) -> bool:
+        """请求时是否要求模型以 JSON 对象格式输出（response_format=json_object）"""
+        return bool(self.llm_config.get("json_mode", False))
+
+    @property
+    def content_token_budget(self) -> int:
+        """每条新闻正文进入提示词的 token 上限，0 表示不截取"""
+        return int(self.llm_config.get("content_token_budget", 0))
+
+
+def valid_field(key: Any, value: Any) -> bool:
+    """丰富结果的单个字段是否有效：已知字段、类型正确，摘要非空"""
+    if key not in ENRICH_FIELDS or not isinstance(value, ENRICH_FIELDS[key]):
+        return False
+    return key != "summary" or bool(value.strip())
+
+
+def batch_element_index(element: Any, size: int) -> Optional[int]:
+    """批量结果数组中一个元素对应的批内序号（从0开始）；index 不在范围内或摘要无效时返回 None"""
+    if not isinstance(element, dict):
+        return None
+    index = element.get("index")
+    if isinstance(index, str) and index.strip().isdigit():
+        index = int(index)
+    if not isinstance(index, int) or not 1 <= index <= size:
+        return None
+    if not valid_field("summary", element.get("summary")):
+        return None
+    return index - 1
+
+
+def apply_enrichment(news: NewsItem, result_json: Optional[Dict[str, Any]]) -> NewsItem:
+    """把解析结果写入新闻项；解析失败时摘要保持不变，来源、地区、关键词置空"""
+    if not result_json:
+        news.source, news.region, news.keywords = "", "", []
+        return news
+    result_json = {key: value for key, value in result_json.items() if valid_field(key, value)}
+    keywords = result_json.get("keywords", [])
+    # 确保keywords是列表
+    if not isinstance(keywords, list):
+        if isinstance(keywords, str):
+            keywords = [k.strip() for k in keywords.split(',') if k.strip()]
+        else:
+            keywords = []
+    news.summary = result_json.get("summary", news.summary)
+    news.source = result_json.get("source", "")
+    news.region = result_json.get("region", "")
+    news.keywords = keywords
+    return news
+
+
+class EnrichRuntime:
+    """
+    单个配置文件对应的新闻丰富运行时（线程安全）
+
+    - 大语言模型客户端懒加载构建一次，并发请求共享其连接池；请求头按运行上下文逐次传入
+    - 用户提示词模板在构建时编译一次
+    """
+
+    def __init__(self, cfg: EnrichConfig):
+        self.cfg = cfg
+        self.user_template = Template(cfg.user_prompt_template)
+        self.batch_user_template = Template(cfg.batch_user_prompt_template) if cfg.batch_user_prompt_template else None
+        self.batch_system_prompt = cfg.system_prompt + cfg.batch_system_prompt
+        self._llm: Optional[ChatOpenAI] = None
+        self._llm_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # 模型不支持 JSON 模式时首次请求失败后关闭，之后只依靠提示词约束输出格式
+        self.json_mode = cfg.json_mode
+        self.stats = {"requests": 0, "client_builds": 0, "batch_requests": 0, "batch_items": 0, "batch_fallbacks": 0,
+                      "early_stops": 0, "parse_failures": 0}
+
+    @property
+    def llm(self) -> ChatOpenAI:
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    llm_config = self.cfg.llm_config
+                    self._llm = ChatOpenAI(
+                        model=self.cfg.model,
+                        api_key=os.getenv("COZE_WORKLOAD_IDENTITY_API_KEY"),
+                        base_url=os.getenv("COZE_INTEGRATION_MODEL_BASE_URL"),
+                        streaming=True,
+                        extra_body={
+                            "thinking": {
+                                "type": "disabled"
+                            }
+                        },
+                        temperature=llm_config.get("temperature", 0.5),
+                        max_tokens=llm_config.get("max_tokens", 800),
+                    )
+                    self._incr_stat("client_builds")
+        return self._llm
+
+    def _incr_stat(self, key: str, value: int = 1):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def trimmed(self, news: NewsItem) -> TrimmedContent:
+        """进入提示词的正文：去除模板文字并按导语优先截取到 content_token_budget（结果按正文缓存）"""
+        return trim_content(news.content, self.cfg.content_token_budget)
+
+    def cache_key(self, news: NewsItem) -> str:
+        # 以实际进入提示词的正文为键，调整预算后缓存自动失效
+        return make_enrich_cache_key(self.cfg.model, self.cfg.prompt_version, news.title, self.trimmed(news).text)
+
+    def _store(self, cache: Optional[EnrichResultCache], news_list: List[NewsItem]):
+        """把已丰富的新闻结果写入缓存"""
+        if cache is None or not news_list:
+            return
+        cache.put_many({
+            self.cache_key(news): {
+                "summary": news.summary, "source": news.source, "region": news.region, "keywords": news.keywords
+            }
+            for news in news_list
+        }, self.cfg.model, self.cfg.prompt_version)
+
+    def build_messages(self, news: NewsItem) -> List[Any]:
+        user_prompt = self.user_template.render({
+            "title": news.title,
+            "content": self.trimmed(news).text
+        })
+        return [
+            SystemMessage(content=self.cfg.system_prompt),
+            HumanMessage(content=user_prompt)
+        ]
+
+    def build_batch_messages(self, news_list: List[NewsItem]) -> List[Any]:
+        user_prompt = self.batch_user_template.render({
+            "items": [
+                {"index": i, "title": news.title, "content": self.trimmed(news).text}
+                for i, news in enumerate(news_list, 1)
+            ]
+        })
+        return [
+            SystemMessage(content=self.batch_system_prompt),
+            HumanMessage(content=user_prompt)
+        ]
+
+    def plan_batches(self, news_list: List[NewsItem]) -> List[List[NewsItem]]:
+        """
+        按顺序把新闻打包为批次：每批不超过 batch_size 条，且各条标题与截取后正文的 token 数之和不超过 batch_token_budget；
+        单条即超出预算的新闻单独成批
+        """
+        batch_size = self.cfg.batch_size
+        if batch_size <= 1:
+            return [[news] for news in news_list]
+        budget = self.cfg.batch_token_budget
+        batches: List[List[NewsItem]] = []
+        current: List[NewsItem] = []
+        current_tokens = 0
+        for news in news_list:
+            tokens = count_tokens(news.title) + self.trimmed(news).trimmed_tokens
+            if current and (len(current) >= batch_size or current_tokens + tokens > budget):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(news)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _stream_into(self, parser: IncrementalJsonParser, messages: List[Any], ctx: Context, **kwargs) -> bool:
+        """流式调用大语言模型，输出逐块交给解析器；外层 JSON 闭合后立即停止读取。返回是否收到了输出"""
+        self._incr_stat("requests")
+        received = False
+        stream = self.llm.stream(messages, extra_headers=default_headers(ctx), **kwargs)
+        try:
+            for chunk in stream:
+                received = True
+                pieces = chunk.content if isinstance(chunk.content, list) else [chunk.content]
+                for piece in pieces:
+                    if isinstance(piece, str) and parser.feed(piece):
+                        break
+                if parser.done:
+                    self._incr_stat("early_stops")
+                    break
+        finally:
+            # 提前结束时关闭流，不再接收剩余的输出
+            stream.close()
+        return received
+
+    def stream_json(self, messages: List[Any], ctx: Context, on_value=None, emit_depth: int = 1,
+                    **kwargs) -> IncrementalJsonParser:
+        """
+        流式调用大语言模型并增量解析输出的 JSON，字段随到随通过 on_value 回调校验；
+        启用 JSON 模式但模型不支持（没有任何输出就失败）时关闭 JSON 模式重试一次
+        """
+        parser = IncrementalJsonParser(on_value, emit_depth)
+        if not self.json_mode:
+            self._stream_into(parser, messages, ctx, **kwargs)
+        else:
+            try:
+                self._stream_into(parser, messages, ctx, response_format={"type": "json_object"}, **kwargs)
+            except Exception as e:
+                if parser.received:
+                    raise
+                print(f"JSON 模式请求失败: {str(e)}, 关闭 JSON 模式后重试")
+                self.json_mode = False
+                parser = IncrementalJsonParser(on_value, emit_depth)
+                self._stream_into(parser, messages, ctx, **kwargs)
+        if not parser.done or parser.value is None:
+            self._incr_stat("parse_failures")
+        return parser
+
+    def enrich(self, news: NewsItem, ctx: Context, cache: Optional[EnrichResultCache] = None) -> NewsItem:
+        """丰富单条新闻（摘要、来源、地区、关键词），失败时返回原始新闻；解析成功的结果写入缓存"""
+        fields: Dict[str, Any] = {}
+
+        def on_value(path, value):
+            if valid_field(path[0], value):
+                fields[path[0]] = value
+
+        try:
+            parser = self.stream_json(self.build_messages(news), ctx, on_value)
+        except Exception as e:
+            # 如果丰富失败，保留原始新闻
+            print(f"丰富新闻失败: {str(e)}, 保留原始新闻")
+            return news
+        # 输出不是完整的 JSON 对象时，摘要保持不变，来源、地区、关键词置空
+        result_json = fields if parser.done and isinstance(parser.value, dict) else None
+        apply_enrichment(news, result_json)
+        if result_json:
+            self._store(cache, [news])
+        return news
+
+    def enrich_batch(self, news_list: List[NewsItem], ctx: Context,
+                     cache: Optional[EnrichResultCache] = None) -> List[NewsItem]:
+        """
+        一个请求丰富一批新闻，模型返回 {"items": [...]}（或直接返回数组），元素按 index 对应批内序号，
+        每个元素闭合即校验；缺失或无效的元素（以及整个请求失败时的全部新闻）改为逐条请求。
+        每批结果返回后立即写入缓存
+        """
+        if len(news_list) == 1 or self.batch_user_template is None:
+            return [self.enrich(news, ctx, cache) for news in news_list]
+        results: Dict[int, Dict[str, Any]] = {}
+
+        def on_value(path, value):
+            # 元素路径为 (下标,) 或 ("items", 下标)
+            if not isinstance(path[-1], int) or len(path) > 2 or (len(path) == 2 and path[0] != "items"):
+                return
+            index = batch_element_index(value, len(news_list))
+            if index is not None and index not in results:
+                results[index] = value
+
+        try:
+            self._incr_stat("batch_requests")
+            max_tokens = int(self.cfg.llm_config.get("max_tokens", 800)) * len(news_list)
+            self.stream_json(self.build_batch_messages(news_list), ctx, on_value, emit_depth=2, max_tokens=max_tokens)
+        except Exception as e:
+            print(f"批量丰富新闻失败: {str(e)}, 改为逐条丰富")
+        self._incr_stat("batch_items", len(results))
+        self._incr_stat("batch_fallbacks", len(news_list) - len(results))
+        batch_done = [apply_enrichment(news_list[i], result) for i, result in sorted(results.items())]
+        self._store(cache, batch_done)
+        return [
+            news if i in results else self.enrich(news, ctx, cache)
+            for i, news in enumerate(news_list)
+        ]
+
+
+_configs: Dict[str, EnrichConfig] = {}
+_runtimes: Dict[str, EnrichRuntime] = {}
+_runtime_lock = threading.Lock()
+_stats = {"config_loads": 0, "config_hits": 0, "runtime_builds": 0, "runtime_hits": 0}
+
+
+def load_enrich_config(cfg_file: str) -> Tuple[EnrichConfig, bool]:
+    """读取配置文件，(路径, 修改时间) 未变时返回缓存；返回 (配置, 是否命中缓存)"""
+    path = os.path.abspath(cfg_file)
+    mtime = os.path.getmtime(path)
+    with _runtime_lock:
+        cached = _configs.get(path)
+        if cached is not None and cached.mtime == mtime:
+            _stats["config_hits"] += 1
+            return cached, True
+    with open(path, 'r') as fd:
+        _cfg = json.load(fd)
+    cfg = EnrichConfig(
+        path=path,
+        mtime=mtime,
+        llm_config=_cfg.get("config", {}),
+        system_prompt=_cfg.get("sp", ""),
+        user_prompt_template=_cfg.get("up", ""),
+        batch_system_prompt=_cfg.get("batch_sp", ""),
+        batch_user_prompt_template=_cfg.get("batch_up", ""),
+    )
+    with _runtime_lock:
+        _configs[path] = cfg
+        _stats["config_loads"] += 1
+    return cfg, False
+
+
+def get_enrich_runtime(cfg_file: str) -> EnrichRuntime:
+    """获取配置文件对应的进程级新闻丰富运行时，配置文件修改后重建"""
+    cfg, _ = load_enrich_config(cfg_file)
+    with _runtime_lock:
+        runtime = _runtimes.get(cfg.path)
+        if runtime is not None and runtime.cfg.mtime == cfg.mtime:
+            _stats["runtime_hits"] += 1
+            return runtime
+        runtime = EnrichRuntime(cfg)
+        _runtimes[cfg.path] = runtime
+        _stats["runtime_builds"] += 1
+        return runtime
+
+
+def get_enrich_stats() -> dict:
+    """
+    获取新闻丰富运行时的复用统计
+
+    返回: config_loads/config_hits（配置读取/缓存命中次数）、runtime_builds/runtime_hits（运行时构建/复用次数）、
+    requests（模型请求次数）、client_builds（客户端构建次数）、config_reuse_rate、client_reuse_rate、
+    batch_requests/batch_items/batch_fallbacks（批量请求次数、批量成功条数、改为逐条请求的条数）、
+    early_stops/parse_failures（JSON 闭合后提前停止读取的请求数、输出不是完整 JSON 的请求数）
+    """
+    with _runtime_lock:
+        stats = dict(_stats)
+        runtimes = list(_runtimes.values())
+    stats["requests"] = sum(r.stats["requests"] for r in runtimes)
+    for key in ("client_builds", "batch_requests", "batch_items", "batch_fallbacks", "early_stops", "parse_failures"):
+        stats[key] = sum(r.stats[key] for r in runtimes)
+    config_reads = stats["config_loads"] + stats["config_hits"]
+    stats["config_reuse_rate"] = round(stats["config_hits"] / config_reads, 3) if config_reads else 0.0
+    stats["client_reuse_rate"] = round(1 - stats["client_builds"] / stats["requests"], 3) if stats["requests"] else 0.0
+    return stats
@@ -0,0 +1,199 @@
+"""
+声明式搜索计划 - 从 config/search_plan.json 读取站点批次、搜索词与专题，编译为去重、打包后的搜索任务
+"""
+import os
+import json
+import threading
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from coze_coding_utils.runtime_ctx.context import Context
+from tools.search_executor import SearchExecutor, SearchResult, SearchTask
+
+SEARCH_PLAN_FILE = "config/search_plan.json"
+# 搜索 API 单次最多支持的站点数
+API_MAX_SITES = 5
+# 未配置专题时，所有搜索词归属的默认专题
+DEFAULT_PROFILE = "default"
+
+
+def _covered_by(host: str, other: str) -> bool:
+    """host 是否被 other 覆盖（相同域名或 other 的子域名）"""
+    return host == other or host.endswith("." + other)
+
+
+def dedupe_hosts(hosts: List[str]) -> List[str]:
+    """移除重复域名以及被父域名覆盖的子域名（如已有 sina.com.cn 时移除 finance.sina.com.cn），保持原顺序"""
+    result = []
+    for host in hosts:
+        host = host.strip().lower()
+        if not host:
+            continue
+        if any(_covered_by(host, other) for other in hosts if other.strip().lower() != host):
+            continue
+        if host not in result:
+            result.append(host)
+    return result
+
+
+@dataclass
+class TopicProfile:
+    """专题（垂直方向）：一组搜索词及其单独的收件人"""
+    name: str
+    desc: str = ""
+    queries: List[str] = field(default_factory=list)
+    emails_list: List[str] = field(default_factory=list)
+
+
+class QueryPlan:
+    """
+    搜索计划
+
+    compile() 将配置编译为搜索任务：
+    1. 同一搜索词出现在多个批次时合并其站点
+    2. 移除同一搜索词站点中的重复域名和被父域名覆盖的子域名
+    3. 站点相同的搜索词归为一组，每组站点按 API 上限（5个）打包
+    编译结果缓存，同一配置只编译一次。
+
+    多个专题共用一次搜索：搜索词按上述规则只搜索一次，任务的 profiles 记录其归属的全部专题，
+    由调用方按专题划分结果。
+    """
+
+    def __init__(self, cfg: Dict[str, Any]):
+        self.max_sites = min(int(cfg.get("max_sites_per_query", API_MAX_SITES)), API_MAX_SITES)
+        concurrency = cfg.get("concurrency", {})
+        self.max_concurrency: Optional[int] = concurrency.get("global")
+        self.per_sites_concurrency: Optional[int] = concurrency.get("per_sites")
+        self.defaults: Dict[str, Any] = cfg.get("defaults", {})
+        self.batches: List[Dict[str, Any]] = cfg.get("batches", [])
+        if not self.batches:
+            raise Exception("搜索计划配置错误: batches 不能为空")
+        for batch in self.batches:
+            if not batch.get("queries"):
+                raise Exception(f"搜索计划配置错误: 批次 {batch.get('name', '')} 缺少 queries")
+        self.profiles: List[TopicProfile] = self._load_profiles(cfg.get("profiles", []))
+        self._tasks: Optional[List[SearchTask]] = None
+        self._lock = threading.Lock()
+
+    def _load_profiles(self, profiles_cfg: List[Dict[str, Any]]) -> List[TopicProfile]:
+        all_queries = list(dict.fromkeys(q for batch in self.batches for q in batch["queries"]))
+        if not profiles_cfg:
+            return [TopicProfile(name=DEFAULT_PROFILE, queries=all_queries)]
+        profiles = []
+        for profile_cfg in profiles_cfg:
+            name = profile_cfg.get("name")
+            if not name or any(p.name == name for p in profiles):
+                raise Exception(f"搜索计划配置错误: 专题名称为空或重复: {name!r}")
+            unknown = [q for q in profile_cfg.get("queries", []) if q not in all_queries]
+            if unknown:
+                raise Exception(f"搜索计划配置错误: 专题 {name} 的搜索词不在任何批次中: {unknown}")
+            emails = profile_cfg.get("emails", "")
+            profiles.append(TopicProfile(
+                name=name,
+                desc=profile_cfg.get("desc", ""),
+                queries=list(profile_cfg.get("queries", [])),
+                emails_list=[e.strip() for e in emails.replace(';', ',').replace(' ', ',').split(',') if e.strip()],
+            ))
+        orphans = [q for q in all_queries if not any(q in p.queries for p in profiles)]
+        if orphans:
+            raise Exception(f"搜索计划配置错误: 搜索词未归属任何专题: {orphans}")
+        return profiles
+
+    def _compile(self) -> List[SearchTask]:
+        # 1. 按搜索词合并站点与参数（保持首次出现的顺序）
+        merged: Dict[str, Dict[str, Any]] = {}
+        for batch in self.batches:
+            for query in batch["queries"]:
+                entry = merged.setdefault(query, {
+                    "hosts": [],
+                    "count": batch.get("count", self.defaults.get("count", 10)),
+                    "time_range": batch.get("time_range", self.defaults.get("time_range")),
+                    "name": batch.get("name", ""),
+                })
+                entry["hosts"].extend(batch.get("sites", []))
+                entry["count"] = max(entry["count"], batch.get("count", self.defaults.get("count", 10)))
+
+        # 2-3. 去除重叠域名，站点相同的搜索词归组
+        groups: Dict[Tuple, Dict[str, Any]] = {}
+        for query, entry in merged.items():
+            hosts = tuple(dedupe_hosts(entry["hosts"]))
+            group_key = (hosts, entry["count"], entry["time_range"])
+            group = groups.setdefault(group_key, {"name": entry["name"], "queries": []})
+            group["queries"].append(query)
+
+        # 4. 每组站点按上限打包，生成任务
+        tasks = []
+        for (hosts, count, time_range), group in groups.items():
+            chunks = [hosts[i:i + self.max_sites] for i in range(0, len(hosts), self.max_sites)] or [()]
+            for chunk_no, chunk in enumerate(chunks, 1):
+                name = group["name"] if len(chunks) == 1 else f"{group['name']}.{chunk_no}"
+                queries = group["queries"]
+                for idx, query in enumerate(queries, 1):
+                    tasks.append(SearchTask(
+                        query=query,
+                        sites="|".join(chunk) or None,
+                        count=count,
+                        time_range=time_range,
+                        label=f"{name}-{idx}/{len(queries)}",
+                        profiles=tuple(p.name for p in self.profiles if query in p.queries),
+                    ))
+        return tasks
+
+    def compile(self) -> List[SearchTask]:
+        """返回编译后的搜索任务（每次返回副本，调用方可自由修改）"""
+        if self._tasks is None:
+            with self._lock:
+                if self._tasks is None:
+                    self._tasks = self._compile()
+        return [replace(task) for task in self._tasks]
+
+    def query_keys(self) -> List[str]:
+        return [task.query_key for task in self.compile()]
+
+    def profile_names(self) -> List[str]:
+        return [p.name for p in self.profiles]
+
+    def get_profile(self, name: str) -> Optional[TopicProfile]:
+        return next((p for p in self.profiles if p.name == name), None)
+
+    def sites_summary(self) -> List[str]:
+        """编译后的站点批次（去重后），用于日志"""
+        return list(dict.fromkeys(task.sites_key for task in self.compile()))
+
+    def executor(self, ctx: Context) -> SearchExecutor:
+        return SearchExecutor(ctx, max_concurrency=self.max_concurrency,
+                              per_sites_concurrency=self.per_sites_concurrency)
+
+    def search(self, ctx: Context, tasks: Optional[List[SearchTask]] = None) -> Iterator[SearchResult]:
+        """并发执行计划（或给定的任务列表），按任务顺序产出结果"""
+        return self.executor(ctx).iter_ordered(tasks if tasks is not None else self.compile())
+
+
+def _plan_path(path: Optional[str] = None) -> str:
+    if path:
+        return path
+    if os.getenv("SEARCH_PLAN_PATH"):
+        return os.getenv("SEARCH_PLAN_PATH")
+    workspace = os.getenv("COZE_WORKSPACE_PATH") or os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return os.path.join(workspace, SEARCH_PLAN_FILE)
+
+
+_plans: Dict[Tuple[str, float], QueryPlan] = {}
+_plans_lock = threading.Lock()
+
+
+def get_search_plan(path: Optional[str] = None) -> QueryPlan:
+    """加载搜索计划，按 (路径, 修改时间) 缓存，配置文件修改后自动重新编译"""
+    plan_path = _plan_path(path)
+    key = (plan_path, os.path.getmtime(plan_path))
+    plan = _plans.get(key)
+    if plan is None:
+        with _plans_lock:
+            plan = _plans.get(key)
+            if plan is None:
+                with open(plan_path, 'r', encoding='utf-8') as fd:
+                    plan = QueryPlan(json.load(fd))
+                for stale in [k for k in _plans if k[0] == plan_path]:
+                    del _plans[stale]
+                _plans[key] = plan
+    return plan
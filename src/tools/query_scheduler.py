@@ -0,0 +1,80 @@
+"""
+自适应查询调度器 - 根据每个查询的历史有效产出（UCB 多臂老虎机）排序、裁剪查询并调整请求条数
+"""
+import os
+import math
+from dataclasses import dataclass, replace
+from typing import Dict, List, Tuple
+
+from tools.search_executor import SearchTask
+
+SEARCH_ADAPTIVE = os.getenv("SEARCH_ADAPTIVE", "1") == "1"
+# UCB 探索系数，越大越倾向于尝试调用次数少的查询；
+# 0.3 时零产出查询调用 SCHEDULER_MIN_CALLS 次后探索项约 0.3，低于裁剪阈值即被裁剪（系数为 1.0 时约需 25 次）
+SCHEDULER_EXPLORATION = float(os.getenv("SCHEDULER_EXPLORATION", "0.3"))
+# 每轮至少保留的查询数
+SCHEDULER_MIN_QUERIES = int(os.getenv("SCHEDULER_MIN_QUERIES", "8"))
+# 调用次数达到该值后才允许被裁剪
+SCHEDULER_MIN_CALLS = int(os.getenv("SCHEDULER_MIN_CALLS", "5"))
+# UCB 得分低于该值的查询被裁剪（每次调用的期望有效条数）
+SCHEDULER_PRUNE_SCORE = float(os.getenv("SCHEDULER_PRUNE_SCORE", "0.5"))
+SCHEDULER_MIN_COUNT = 5
+SCHEDULER_MAX_COUNT = 20
+
+
+@dataclass
+class QueryArm:
+    """调度器视角的查询统计"""
+    calls: int = 0
+    ema_survivors: float = 0.0
+    ema_hit_rate: float = 0.0
+
+
+class QueryScheduler:
+    """基于 UCB1 的查询调度器：高产出查询优先，长期低产出的查询被裁剪，但随探索项增长会重新被尝试"""
+
+    def __init__(
+            self,
+            arms: Dict[str, QueryArm],
+            exploration: float = SCHEDULER_EXPLORATION,
+            min_queries: int = SCHEDULER_MIN_QUERIES,
+            min_calls: int = SCHEDULER_MIN_CALLS,
+            prune_score: float = SCHEDULER_PRUNE_SCORE,
+    ):
+        self.arms = arms
+        self.exploration = exploration
+        self.min_queries = min_queries
+        self.min_calls = min_calls
+        self.prune_score = prune_score
+        self.total_calls = sum(arm.calls for arm in arms.values())
+
+    def score(self, query_key: str) -> float:
+        arm = self.arms.get(query_key)
+        if arm is None or arm.calls == 0:
+            return math.inf
+        bonus = self.exploration * math.sqrt(math.log(self.total_calls + 1) / arm.calls)
+        return arm.ema_survivors + bonus
+
+    def adapt_count(self, task: SearchTask) -> int:
+        """有效比例高的查询请求更多条数，有效比例低的查询少请求，未知查询保持原值"""
+        arm = self.arms.get(task.query_key)
+        if arm is None or arm.calls == 0:
+            return task.count
+        count = round(task.count * (0.5 + 1.5 * arm.ema_hit_rate))
+        return max(SCHEDULER_MIN_COUNT, min(SCHEDULER_MAX_COUNT, count))
+
+    def plan(self, tasks: List[SearchTask]) -> Tuple[List[SearchTask], List[SearchTask]]:
+        """
+        返回 (调度后的任务列表, 被裁剪的任务列表)
+        调度后的任务按得分从高到低排序（同分保持原顺序），并调整了请求条数
+        """
+        ranked = sorted(enumerate(tasks), key=lambda x: (-self.score(x[1].query_key), x[0]))
+        scheduled, pruned = [], []
+        for _, task in ranked:
+            arm = self.arms.get(task.query_key)
+            prunable = arm is not None and arm.calls >= self.min_calls
+            if prunable and len(scheduled) >= self.min_queries and self.score(task.query_key) < self.prune_score:
+                pruned.append(task)
+                continue
+            scheduled.append(replace(task, count=self.adapt_count(task)))
+        return scheduled, pruned
@@ -0,0 +1,123 @@
+"""
+令牌桶限流器 - 进程级共享的搜索 API 限流，按需阻塞并遵循服务端限流信号
+"""
+import os
+import time
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+# 搜索 API 每秒请求数与突发容量
+SEARCH_RATE_LIMIT_RPS = float(os.getenv("SEARCH_RATE_LIMIT_RPS", "5"))
+SEARCH_RATE_LIMIT_BURST = int(os.getenv("SEARCH_RATE_LIMIT_BURST", "10"))
+# 服务端要求的等待时间上限（秒），防止异常的 Retry-After 把流程挂起过久
+MAX_SERVER_DELAY = 60.0
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期），返回需要等待的秒数"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶
+
+    - 以 rate 个/秒的速度补充令牌，最多积累 burst 个
+    - acquire() 只在令牌不足时阻塞必要的时长
+    - 服务端返回限流信号时暂停发放令牌直到指定时间
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = max(rate, 0.001)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "server_throttles": 0}
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """获取一个令牌，返回实际等待的秒数"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    delay = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    self._stats["acquired"] += 1
+                    if waited > 0:
+                        self._stats["waited"] += 1
+                        self._stats["wait_seconds"] += waited
+                    return waited
+                else:
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """服务端限流：在 seconds 秒内不再发放令牌，并清空已积累的令牌"""
+        seconds = min(max(0.0, seconds), MAX_SERVER_DELAY)
+        with self._lock:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + seconds)
+            self._tokens = 0.0
+            self._updated = now
+            self._stats["server_throttles"] += 1
+
+    def observe_response(self, status_code: int, headers: Mapping[str, str]):
+        """根据响应的状态码和限流头调整令牌发放"""
+        retry_after = _parse_retry_after(headers.get("Retry-After"))
+        if status_code == 429:
+            self.pause(retry_after if retry_after is not None else 1.0 / self.rate)
+            return
+        if retry_after is not None and status_code == 503:
+            self.pause(retry_after)
+            return
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is not None and reset is not None:
+            try:
+                if int(remaining) <= 0:
+                    reset_value = float(reset)
+                    # 兼容绝对时间戳与相对秒数两种写法
+                    delay = reset_value - time.time() if reset_value > 1e9 else reset_value
+                    self.pause(delay)
+            except ValueError:
+                pass
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 2)
+        return stats
+
+
+_search_limiter: Optional[TokenBucket] = None
+_search_limiter_lock = threading.Lock()
+
+
+def get_search_rate_limiter() -> TokenBucket:
+    """获取进程级共享的搜索 API 限流器"""
+    global _search_limiter
+    if _search_limiter is None:
+        with _search_limiter_lock:
+            if _search_limiter is None:
+                _search_limiter = TokenBucket(SEARCH_RATE_LIMIT_RPS, SEARCH_RATE_LIMIT_BURST)
+    return _search_limiter
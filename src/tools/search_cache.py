@@ -0,0 +1,184 @@
+"""
+web_search 响应缓存 - 进程内 LRU + 磁盘 sqlite（zstd 压缩）两级缓存，带 TTL 与容量淘汰
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import orjson
+import zstandard
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "1") == "1"
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "/tmp/medical_news_cache/web_search.sqlite3")
+# 缓存有效期（秒），默认6小时：覆盖同一天内的手动重跑、节点调试与失败重试
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(6 * 3600)))
+# 进程内 LRU 条目数
+SEARCH_CACHE_MEMORY_SIZE = int(os.getenv("SEARCH_CACHE_MEMORY_SIZE", "256"))
+# 磁盘缓存容量上限（压缩后字节数）
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+
+def make_cache_key(**params: Any) -> str:
+    """根据搜索参数生成缓存键（参数按名称排序后哈希）"""
+    raw = orjson.dumps(params, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(raw).hexdigest()
+
+
+class SearchCache:
+    """两级搜索响应缓存，缓存内容为搜索 API 返回的 Result 字典"""
+
+    def __init__(
+            self,
+            path: str = SEARCH_CACHE_PATH,
+            ttl: int = SEARCH_CACHE_TTL,
+            memory_size: int = SEARCH_CACHE_MEMORY_SIZE,
+            max_bytes: int = SEARCH_CACHE_MAX_BYTES,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._memory: TTLCache = TTLCache(maxsize=memory_size, ttl=ttl)
+        # _lock 只保护内存层与统计计数；磁盘层每个线程各用一个连接与 zstd 上下文，由 sqlite 自身处理并发
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._disk_ok = True
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def _get_conn(self) -> Optional[sqlite3.Connection]:
+        """懒加载当前线程的磁盘缓存连接，磁盘不可用时退化为仅内存缓存"""
+        if not self._disk_ok:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS search_cache ("
+                        " key TEXT PRIMARY KEY,"
+                        " created_at REAL NOT NULL,"
+                        " accessed_at REAL NOT NULL,"
+                        " size INTEGER NOT NULL,"
+                        " payload BLOB NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS ix_search_cache_accessed_at ON search_cache (accessed_at)")
+                    conn.commit()
+                    self._schema_ready = True
+            self._local.conn = conn
+            # zstd 压缩/解压上下文不可跨线程并发使用，与连接一起按线程保存
+            self._local.compressor = zstandard.ZstdCompressor(level=3)
+            self._local.decompressor = zstandard.ZstdDecompressor()
+        except Exception as e:
+            logger.warning(f"search cache disk tier disabled: {e}")
+            self._disk_ok = False
+            return None
+        return conn
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._stats[name] += n
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._stats["memory_hits"] += 1
+                return value
+        conn = self._get_conn()
+        if conn is not None:
+            try:
+                now = time.time()
+                row = conn.execute(
+                    "SELECT payload FROM search_cache WHERE key = ? AND created_at >= ?",
+                    (key, now - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    value = orjson.loads(self._local.decompressor.decompress(row[0]))
+                    conn.execute("UPDATE search_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                    conn.commit()
+                    with self._lock:
+                        self._memory[key] = value
+                        self._stats["disk_hits"] += 1
+                    return value
+            except Exception as e:
+                logger.warning(f"search cache read failed: {e}")
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._memory[key] = value
+        conn = self._get_conn()
+        if conn is None:
+            return
+        try:
+            payload = self._local.compressor.compress(orjson.dumps(value))
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, created_at, accessed_at, size, payload) VALUES (?, ?, ?, ?, ?)",
+                (key, now, now, len(payload), payload)
+            )
+            conn.commit()
+            self._count("writes")
+            self._evict(conn, now)
+        except Exception as e:
+            logger.warning(f"search cache write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """先删除过期条目，再按最近访问时间淘汰直到容量低于上限"""
+        deleted = conn.execute("DELETE FROM search_cache WHERE created_at < ?", (now - self.ttl,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM search_cache").fetchone()[0]
+        if total > self.max_bytes:
+            rows = conn.execute("SELECT key, size FROM search_cache ORDER BY accessed_at").fetchall()
+            victims = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                victims.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM search_cache WHERE key = ?", victims)
+            deleted += len(victims)
+        conn.commit()
+        self._count("evictions", deleted)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        conn = self._get_conn()
+        if conn is not None:
+            conn.execute("DELETE FROM search_cache")
+            conn.commit()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+_cache: Optional[SearchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """获取进程级共享的搜索缓存实例"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SearchCache()
+    return _cache
@@ -0,0 +1,276 @@
+"""
+并发搜索执行器 - 将一轮搜索的所有查询并发发送，并按稳定顺序合并结果
+"""
+import os
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, Future, InvalidStateError
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from coze_coding_utils.runtime_ctx.context import Context
+from tools.circuit_breaker import CircuitBreaker, CircuitOpenError, get_breaker_registry
+
+logger = logging.getLogger(__name__)
+
+# 全局并发上限（同时在途的搜索请求数）
+SEARCH_MAX_CONCURRENCY = int(os.getenv("SEARCH_MAX_CONCURRENCY", "8"))
+# 单个站点批次（同一 sites 参数）的并发上限
+SEARCH_PER_SITES_CONCURRENCY = int(os.getenv("SEARCH_PER_SITES_CONCURRENCY", "4"))
+# 对冲请求：调用耗时超过该站点批次的 p95 延迟后再发一个相同请求，取先返回的结果
+SEARCH_HEDGE = os.getenv("SEARCH_HEDGE", "0") == "1"
+# 站点批次至少积累该数量的延迟样本后才启用对冲
+SEARCH_HEDGE_MIN_SAMPLES = int(os.getenv("SEARCH_HEDGE_MIN_SAMPLES", "10"))
+SEARCH_HEDGE_MIN_DELAY = 1.0
+
+
+@dataclass
+class SearchTask:
+    """一次搜索查询"""
+    query: str
+    sites: Optional[str] = None
+    count: int = 10
+    need_content: bool = True
+    need_summary: bool = True
+    time_range: Optional[str] = None
+    label: str = ""
+    # 搜索词归属的专题（多个专题共用同一次搜索）
+    profiles: Tuple[str, ...] = ()
+    # 是否使用响应缓存；重复轮次需要绕过缓存，否则只会得到与上一轮相同的结果
+    use_cache: bool = True
+
+    @property
+    def sites_key(self) -> str:
+        return self.sites or ""
+
+    @property
+    def query_key(self) -> str:
+        """查询的持久化标识（站点批次::搜索词），用于水位线等按查询记录的状态"""
+        return f"{self.sites_key}::{self.query}"
+
+
+@dataclass
+class SearchResult:
+    """一次搜索查询的结果"""
+    task: SearchTask
+    index: int
+    web_items: List[Any] = field(default_factory=list)
+    error: Optional[Exception] = None
+    elapsed: float = 0.0
+    cancelled: bool = False
+    hedged: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class SearchExecutor:
+    """
+    并发搜索执行器
+
+    - 全局并发受 max_concurrency 限制（线程池大小）
+    - 同一站点批次的并发受 per_sites_concurrency 限制
+    - 结果按任务提交顺序产出，与完成先后无关，保证合并顺序稳定
+    - 调用方提前结束迭代（break 或 close()）时取消排队中的查询，
+      在途查询不再等待，统计记录在 last_run_stats 中
+    - 每个站点批次有熔断器，熔断期间该批次的查询直接跳过；熔断器只统计 HTTP 请求本身的耗时
+    - 可选对冲请求降低长尾延迟：主请求在工作线程中执行，对冲请求在独立线程池（2 × max_concurrency）中
+      延迟发出并同样占用站点批次的并发名额，先成功返回的结果即为该任务的结果
+    """
+
+    def __init__(
+            self,
+            ctx: Context,
+            max_concurrency: Optional[int] = None,
+            per_sites_concurrency: Optional[int] = None,
+            search_fn: Optional[Callable[..., Any]] = None,
+            hedge: Optional[bool] = None,
+    ):
+        self.ctx = ctx
+        self.max_concurrency = max(1, max_concurrency or SEARCH_MAX_CONCURRENCY)
+        self.per_sites_concurrency = max(1, per_sites_concurrency or SEARCH_PER_SITES_CONCURRENCY)
+        self._pop_latency: Optional[Callable[[], Optional[float]]] = None
+        if search_fn is None:
+            from tools.web_search_tool import web_search, pop_request_latency
+            search_fn = web_search
+            self._pop_latency = pop_request_latency
+        self._search_fn = search_fn
+        self.hedge = SEARCH_HEDGE if hedge is None else hedge
+        self._breakers = get_breaker_registry()
+        self._sites_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self.last_run_stats: Dict[str, int] = {}
+
+    def _get_sites_semaphore(self, sites_key: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            sem = self._sites_semaphores.get(sites_key)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self.per_sites_concurrency)
+                self._sites_semaphores[sites_key] = sem
+            return sem
+
+    @staticmethod
+    def _settle(outcome: Future, result: SearchResult):
+        """设置任务结果；主请求与对冲请求只有先到的一个生效"""
+        try:
+            outcome.set_result(result)
+        except InvalidStateError:
+            pass
+
+    @staticmethod
+    def _forward_error(outcome: Future) -> Callable[[Future], None]:
+        """工作线程意外异常（未设置任务结果）时把异常转给任务结果，避免调用方一直等待"""
+        def callback(future: Future):
+            if not future.cancelled() and future.exception() is not None and not outcome.done():
+                outcome.set_exception(future.exception())
+        return callback
+
+    def _execute(self, index: int, task: SearchTask, cancel_event: threading.Event,
+                 run_stats: Dict[str, int], outcome: Future, hedge_pool: Optional[ThreadPoolExecutor]):
+        sem = self._get_sites_semaphore(task.sites_key)
+        with sem:
+            # 排队期间已被取消的查询不再发出请求
+            if cancel_event.is_set():
+                with self._lock:
+                    run_stats["skipped"] += 1
+                self._settle(outcome, SearchResult(task=task, index=index, cancelled=True))
+                return
+            # 站点批次熔断期间直接跳过，不占用请求
+            breaker = self._breakers.get(task.sites_key)
+            if not breaker.allow():
+                with self._lock:
+                    run_stats["breaker_skipped"] += 1
+                self._settle(outcome, SearchResult(task=task, index=index,
+                                                   error=CircuitOpenError(f"站点批次已熔断: {task.sites_key}")))
+                return
+            with self._lock:
+                run_stats["dispatched"] += 1
+            start = time.time()
+            primary_done = threading.Event()
+            backup = None
+            if hedge_pool is not None and breaker.sample_count() >= SEARCH_HEDGE_MIN_SAMPLES:
+                delay = max(SEARCH_HEDGE_MIN_DELAY, breaker.percentile(0.95) or 0.0)
+                backup = hedge_pool.submit(contextvars.copy_context().run, self._hedge, index, task, breaker,
+                                           delay, primary_done, outcome, start, run_stats)
+            # 主请求在当前工作线程中执行
+            try:
+                web_items, latency = self._call(task)
+            except Exception as e:
+                primary_done.set()
+                breaker.record_failure()
+                logger.warning(f"search failed: query={task.query!r} sites={task.sites!r}: {e}")
+                # 对冲请求已发出时等待其结果，成功则由它设置任务结果
+                if backup is not None:
+                    backup.result()
+                self._settle(outcome, SearchResult(task=task, index=index, error=e, elapsed=time.time() - start))
+                return
+            primary_done.set()
+            breaker.record_success(latency)
+            self._settle(outcome, SearchResult(task=task, index=index, web_items=web_items or [],
+                                               elapsed=time.time() - start))
+
+    def _hedge(self, index: int, task: SearchTask, breaker: CircuitBreaker, delay: float,
+               primary_done: threading.Event, outcome: Future, start: float, run_stats: Dict[str, int]):
+        """主请求超过 p95 延迟仍未返回时再发一个相同请求；站点批次并发已满时不发"""
+        if primary_done.wait(delay):
+            return
+        sem = self._get_sites_semaphore(task.sites_key)
+        if not sem.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                run_stats["hedged"] += 1
+            try:
+                web_items, latency = self._call(task)
+            except Exception as e:
+                breaker.record_failure()
+                logger.warning(f"hedged search failed: query={task.query!r} sites={task.sites!r}: {e}")
+                return
+            breaker.record_success(latency)
+            self._settle(outcome, SearchResult(task=task, index=index, web_items=web_items or [],
+                                               elapsed=time.time() - start, hedged=True))
+        finally:
+            sem.release()
+
+    def _call(self, task: SearchTask) -> Tuple[List[Any], float]:
+        """发起一次搜索，返回 (结果项, HTTP 请求耗时)；无法取得请求耗时（如命中缓存、自定义搜索函数）时按调用耗时计"""
+        start = time.time()
+        web_items, _, _, _ = self._search_fn(
+            ctx=self.ctx,
+            query=task.query,
+            search_type="web",
+            count=task.count,
+            need_summary=task.need_summary,
+            need_content=task.need_content,
+            sites=task.sites,
+            time_range=task.time_range,
+            use_cache=task.use_cache,
+        )
+        latency = self._pop_latency() if self._pop_latency is not None else None
+        return web_items, time.time() - start if latency is None else latency
+
+    @staticmethod
+    def _interleave(tasks: List[SearchTask]) -> List[int]:
+        """按站点批次轮转排列提交顺序，避免同一批次的任务占满线程池后互相等待"""
+        groups: Dict[str, List[int]] = {}
+        for i, task in enumerate(tasks):
+            groups.setdefault(task.sites_key, []).append(i)
+        order = []
+        queues = list(groups.values())
+        while any(queues):
+            for q in queues:
+                if q:
+                    order.append(q.pop(0))
+        return order
+
+    def iter_ordered(self, tasks: List[SearchTask]) -> Iterator[SearchResult]:
+        """
+        并发执行所有任务，按任务顺序逐个产出结果（前序结果就绪即产出）
+
+        提前结束迭代即取消剩余查询：未开始的查询直接取消，排队等待并发名额的查询不再发出，
+        已发出的查询不再等待其返回。
+        """
+        run_stats = {"total": len(tasks), "consumed": 0, "cancelled": 0, "skipped": 0,
+                     "abandoned": 0, "dispatched": 0, "breaker_skipped": 0, "hedged": 0}
+        self.last_run_stats = run_stats
+        if not tasks:
+            return
+        cancel_event = threading.Event()
+        pool = ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(tasks)),
+                                  thread_name_prefix="web_search")
+        # 对冲请求的线程池：每个在途的主请求最多一个对冲请求，不与主请求争用线程
+        hedge_pool = ThreadPoolExecutor(max_workers=2 * self.max_concurrency,
+                                        thread_name_prefix="web_search_hedge") if self.hedge else None
+        futures: List[Optional[Future]] = [None] * len(tasks)
+        outcomes: List[Optional[Future]] = [Future() for _ in tasks]
+        try:
+            for i in self._interleave(tasks):
+                # 每个任务使用独立的上下文副本，保证链路追踪信息在工作线程中可用
+                futures[i] = pool.submit(contextvars.copy_context().run, self._execute, i, tasks[i],
+                                         cancel_event, run_stats, outcomes[i], hedge_pool)
+                futures[i].add_done_callback(self._forward_error(outcomes[i]))
+            for i in range(len(futures)):
+                result = outcomes[i].result()
+                # 产出后释放对结果的引用，峰值内存只取决于在途与未消费的结果
+                outcomes[i] = None
+                run_stats["consumed"] += 1
+                yield result
+        finally:
+            cancel_event.set()
+            for i, future in enumerate(futures):
+                if future is None or future.done() or (outcomes[i] is None or outcomes[i].done()):
+                    continue
+                if future.cancel():
+                    run_stats["cancelled"] += 1
+                else:
+                    run_stats["abandoned"] += 1
+            pool.shutdown(wait=False, cancel_futures=True)
+            if hedge_pool is not None:
+                hedge_pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, tasks: List[SearchTask]) -> List[SearchResult]:
+        """并发执行所有任务，返回按任务顺序排列的结果列表"""
+        return list(self.iter_ordered(tasks))
@@ -1,9 +1,133 @@
 import os
+import time
+import random
+import threading
+import orjson
 import requests
-from typing import Optional, Tuple, List
+from requests.adapters import HTTPAdapter
+from typing import Any, Dict, Optional, Tuple, List, Union
 from pydantic import BaseModel, Field
 from cozeloop.decorator import observe
 from coze_coding_utils.runtime_ctx.context import Context, default_headers
+from tools.search_cache import SEARCH_CACHE_ENABLED, get_search_cache, make_cache_key
+from tools.rate_limiter import get_search_rate_limiter
+
+# HTTP 连接池与超时配置
+SEARCH_CONNECT_TIMEOUT = float(os.getenv("SEARCH_CONNECT_TIMEOUT", "5"))
+SEARCH_READ_TIMEOUT = float(os.getenv("SEARCH_READ_TIMEOUT", "30"))
+SEARCH_POOL_MAXSIZE = int(os.getenv("SEARCH_POOL_MAXSIZE", "16"))
+# 重试预算：失败后最多重试次数，退避时间为带抖动的指数退避
+SEARCH_MAX_RETRIES = int(os.getenv("SEARCH_MAX_RETRIES", "2"))
+SEARCH_BACKOFF_BASE = 0.5
+SEARCH_BACKOFF_MAX = 8.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# 是否对搜索结果做完整的 pydantic 校验（默认使用轻量结果项，按需校验）
+SEARCH_STRICT_VALIDATION = os.getenv("SEARCH_STRICT_VALIDATION", "0") == "1"
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "retries": 0, "failures": 0}
+# 当前线程最近一次 web_search 的 HTTP 请求耗时（不含限流等待与重试退避），供熔断器统计延迟
+_request_timing = threading.local()
+
+
+def _get_session() -> requests.Session:
+    """获取进程级共享的 keep-alive 会话（懒加载）"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=SEARCH_POOL_MAXSIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _incr_stat(key: str, value: int = 1):
+    with _stats_lock:
+        _stats[key] += value
+
+
+def pop_request_latency() -> Optional[float]:
+    """
+    取出当前线程最近一次 web_search 中最慢一次 HTTP 尝试的耗时（秒）并清空；
+    命中缓存、没有发出请求时返回 None
+    """
+    latency = getattr(_request_timing, "latency", None)
+    _request_timing.latency = None
+    return latency
+
+
+def _record_latency(elapsed: float):
+    latency = getattr(_request_timing, "latency", None)
+    _request_timing.latency = elapsed if latency is None else max(latency, elapsed)
+
+
+def _backoff_delay(attempt: int) -> float:
+    """带完全抖动的指数退避"""
+    return random.uniform(0, min(SEARCH_BACKOFF_MAX, SEARCH_BACKOFF_BASE * (2 ** attempt)))
+
+
+def get_http_stats() -> dict:
+    """
+    获取搜索 HTTP 客户端的连接复用统计
+
+    返回: requests（请求次数）、retries（重试次数）、failures（最终失败次数）、
+    connections（新建连接数）、reused（复用连接的请求数）、reuse_rate（连接复用率）
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    connections = 0
+    pool_requests = 0
+    if _session is not None:
+        for adapter in set(_session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                connections += pool.num_connections
+                pool_requests += pool.num_requests
+    stats["connections"] = connections
+    stats["reused"] = max(0, pool_requests - connections)
+    stats["reuse_rate"] = round(stats["reused"] / pool_requests, 3) if pool_requests else 0.0
+    stats["rate_limit"] = get_search_rate_limiter().get_stats()
+    return stats
+
+
+def _post_with_retry(url: str, payload: dict, headers: dict) -> requests.Response:
+    """
+    在共享会话上发送请求，每次尝试前从进程级令牌桶获取令牌；
+    连接错误、超时和可重试状态码按重试预算退避重试，服务端限流信号反馈给令牌桶
+    """
+    session = _get_session()
+    limiter = get_search_rate_limiter()
+    last_error: Optional[Exception] = None
+    for attempt in range(SEARCH_MAX_RETRIES + 1):
+        limiter.acquire()
+        _incr_stat("requests")
+        # 只计 HTTP 请求本身的耗时，令牌桶等待与限流暂停不计入
+        attempt_start = time.time()
+        try:
+            response = session.post(url, json=payload, headers=headers,
+                                    timeout=(SEARCH_CONNECT_TIMEOUT, SEARCH_READ_TIMEOUT))
+            _record_latency(time.time() - attempt_start)
+            limiter.observe_response(response.status_code, response.headers)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == SEARCH_MAX_RETRIES:
+                return response
+            last_error = requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            response.close()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _record_latency(time.time() - attempt_start)
+            last_error = e
+        if attempt < SEARCH_MAX_RETRIES:
+            _incr_stat("retries")
+            time.sleep(_backoff_delay(attempt))
+    _incr_stat("failures")
+    raise last_error
 
 
 class WebItem(BaseModel):
@@ -37,6 +161,44 @@ class WebItem(BaseModel):
                                description="权威度评级, 对应权威度描述, 包括: 1 非常权威、2 正常权威、3 一般权威、4 一般不权威")
 
 
+class LiteWebItem:
+    """
+    轻量搜索结果项：只提取流程中用到的字段，不做校验。
+    其余字段（SiteName、LogoUrl、RankScore、AuthInfoDes 等）访问时从原始数据惰性读取，
+    需要完整校验时调用 to_model() 得到 WebItem；model_dump() 与 WebItem 一样返回全部字段的字典。
+    """
+
+    __slots__ = ("_raw", "Id", "SortId", "Title", "Url", "Snippet", "Summary", "Content", "PublishTime")
+
+    def __init__(self, raw: dict):
+        self._raw = raw
+        self.Id = raw.get("Id")
+        self.SortId = raw.get("SortId")
+        self.Title = raw.get("Title") or ""
+        self.Url = raw.get("Url")
+        self.Snippet = raw.get("Snippet") or ""
+        self.Summary = raw.get("Summary")
+        self.Content = raw.get("Content")
+        self.PublishTime = raw.get("PublishTime")
+
+    def __getattr__(self, name: str) -> Any:
+        if name in WebItem.model_fields:
+            return self._raw.get(name)
+        raise AttributeError(name)
+
+    def to_model(self) -> WebItem:
+        """完整校验并转换为 WebItem"""
+        return WebItem(**self._raw)
+
+    def model_dump(self) -> Dict[str, Any]:
+        """全部字段的字典（不做校验）"""
+        return {name: getattr(self, name) for name in WebItem.model_fields}
+
+
+# web_search 返回的搜索结果项：默认为轻量结果项，validate=True 时为完整校验的 WebItem
+SearchItem = Union[WebItem, LiteWebItem]
+
+
 class ImageInfo(BaseModel):
     """ImageInfo-图片结果项（图片详情子模型）"""
 
@@ -85,7 +247,9 @@ def web_search(
         block_hosts: Optional[str] = None,
         need_summary: Optional[bool] = True,
         time_range: Optional[str] = None,
-) -> Tuple[List[WebItem], str, Optional[List[ImageItem]], dict]:
+        use_cache: Optional[bool] = True,
+        validate: Optional[bool] = None,
+) -> Tuple[List[SearchItem], str, Optional[List[ImageItem]], dict]:
     """
     融合信息搜索API，返回搜索结果项列表、搜索结果内容总结和原始响应数据。
 
@@ -100,10 +264,26 @@ def web_search(
         block_hosts (str, 可选): 指定屏蔽的搜索Site，多个域名使用'|'分隔，最多支持5个。需填入完整域名，示例：aliyun.com|mp.qq.com。
         need_summary (bool, 可选): 是否需要精准摘要，默认true。调用 web_summary web搜索总结版 时，本字段必须为true。
         time_range (str, 可选): 指定搜索的发文时间。以下枚举值，不填即为不限制：OneDay：1天内；OneWeek：1周内；OneMonth：1月内；OneYear：1年内；YYYY-MM-DD..YYYY-MM-DD：从日期A（包含）至日期B（包含）区间段内发文的内容，示例"2024-12-30..2025-12-30"。
+        use_cache (bool, 可选): 是否使用响应缓存（进程内 LRU + 磁盘缓存），默认true。相同参数的重复搜索直接返回缓存结果。
+        validate (bool, 可选): 是否对结果项做完整的 pydantic 校验并返回 WebItem，默认取环境变量 SEARCH_STRICT_VALIDATION（false）。为false时返回字段相同的轻量结果项 LiteWebItem。
 
     Returns:
-        tuple[list[WebItem], str, Optional[list[ImageItem]], dict]: 包含WebItem列表、搜索结果摘要、ImageItem列表(如有)和原始响应数据的元组。
+        tuple[list[SearchItem], str, Optional[list[ImageItem]], dict]: 包含搜索结果项列表（LiteWebItem，validate 为true时为WebItem）、搜索结果摘要、ImageItem列表(如有)和原始响应数据的元组。
     """
+    _request_timing.latency = None
+    cache = None
+    cache_key = None
+    if use_cache and SEARCH_CACHE_ENABLED:
+        cache = get_search_cache()
+        cache_key = make_cache_key(
+            query=query, search_type=search_type, sites=sites, block_hosts=block_hosts,
+            time_range=time_range, count=count, need_content=need_content,
+            need_url=need_url, need_summary=need_summary,
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return _parse_result(cached, validate)
+
     api_key = os.getenv("COZE_WORKLOAD_IDENTITY_API_KEY")
     base_url = os.getenv("COZE_INTEGRATION_BASE_URL")
     headers = {
@@ -125,28 +305,42 @@ def web_search(
         "TimeRange": time_range,
     }
     try:
-        response = requests.post(f'{base_url}/api/search_api/web_search', json=request, headers=headers)
-        response.raise_for_status()  # 检查HTTP请求状态
-        data = response.json()
+        response = _post_with_retry(f'{base_url}/api/search_api/web_search', request, headers)
+        try:
+            response.raise_for_status()  # 检查HTTP请求状态
+            data = orjson.loads(response.content)
+        finally:
+            response.close()
 
         response_metadata = data.get("ResponseMetadata", {})
         result = data.get("Result", {})
         if response_metadata.get("Error"):
             raise Exception(f"web_search 失败: {response_metadata.get('Error')}")
 
-        web_items = []
-        image_items = []
-        if result.get("WebResults"):
-            web_items = [WebItem(**item) for item in result.get("WebResults", [])]
-        if result.get("ImageResults"):
-            image_items = [ImageItem(**item) for item in result.get("ImageResults", [])]
-        content = None
-        if result.get("Choices"):
-            content = result.get("Choices", [{}])[0].get("Message", {}).get("Content", "")
-        return web_items, content, image_items, result
+        parsed = _parse_result(result, validate)
+        if cache is not None:
+            cache.set(cache_key, result)
+        return parsed
     except requests.RequestException as e:
         raise Exception(f"网络请求失败: {str(e)}")
     except Exception as e:
         raise Exception(f"web_search 失败: {str(e)}")
-    finally:
-        response.close()
+
+
+def _parse_result(result: dict, validate: Optional[bool] = None) -> Tuple[List[SearchItem], str, Optional[List[ImageItem]], dict]:
+    """将搜索 API 的 Result 字典解析为 web_search 的返回值"""
+    if validate is None:
+        validate = SEARCH_STRICT_VALIDATION
+    web_items = []
+    image_items = []
+    if result.get("WebResults"):
+        if validate:
+            web_items = [WebItem(**item) for item in result.get("WebResults", [])]
+        else:
+            web_items = [LiteWebItem(item) for item in result.get("WebResults", [])]
+    if result.get("ImageResults"):
+        image_items = [ImageItem(**item) for item in result.get("ImageResults", [])]
+    content = None
+    if result.get("Choices"):
+        content = result.get("Choices", [{}])[0].get("Message", {}).get("Content", "")
+    return web_items, content, image_items, result
@@ -0,0 +1,144 @@
+"""
+增量 JSON 解析 - 逐块读取大语言模型的流式输出，跳过 JSON 之前的说明文字与代码块标记，
+外层对象/数组闭合即完成；浅层的成员（对象的键值对、数组元素）一闭合就解析并回调，便于边接收边校验
+"""
+import json
+from bisect import bisect_right
+from typing import Any, Callable, List, Optional, Tuple
+
+# 回调参数：(从外层开始的键/下标路径, 解析后的值)
+ValueCallback = Callable[[Tuple[Any, ...], Any], None]
+
+_OPENERS = {"{": "}", "[": "]"}
+
+
+class _Container:
+    __slots__ = ("closer", "start", "key", "value_start", "index")
+
+    def __init__(self, closer: str, start: int):
+        self.closer = closer
+        self.start = start  # 当前成员的起始偏移
+        self.key = None  # 对象：当前成员的键
+        self.value_start = None  # 对象：当前成员值的起始偏移
+        self.index = 0  # 数组：当前元素下标
+
+    @property
+    def is_object(self) -> bool:
+        return self.closer == "}"
+
+
+class IncrementalJsonParser:
+    """
+    增量 JSON 解析器
+
+    feed() 逐块输入文本，只扫描一遍：跟踪字符串/转义状态与容器栈，分块原样保存，
+    成员与整体只在闭合时按偏移切片解析一次，不做字符串拼接。
+    - done: 外层 JSON 已闭合，调用方可以停止读取
+    - value: 闭合后的完整解析结果
+    - errors: 解析失败的成员数（不影响其他成员的回调）
+    emit_depth 控制回调的层数：1 只回调外层成员，2 同时回调外层成员内的成员（如 {"items": [...]} 中的元素）
+    """
+
+    def __init__(self, on_value: Optional[ValueCallback] = None, emit_depth: int = 1):
+        self.on_value = on_value
+        self.emit_depth = emit_depth
+        self.done = False
+        self.value: Any = None
+        self.errors = 0
+        self._chunks: List[str] = []
+        self._offsets: List[int] = []
+        self._length = 0
+        self._root_start: Optional[int] = None
+        self._stack: List[_Container] = []
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def received(self) -> int:
+        """已接收的字符数"""
+        return self._length
+
+    def _slice(self, start: int, end: int) -> str:
+        """按全局偏移切取已接收的文本"""
+        i = bisect_right(self._offsets, start) - 1
+        parts = []
+        while i < len(self._chunks) and self._offsets[i] < end:
+            chunk_start = self._offsets[i]
+            parts.append(self._chunks[i][max(0, start - chunk_start):end - chunk_start])
+            i += 1
+        return "".join(parts)
+
+    def _path(self) -> Tuple[Any, ...]:
+        return tuple(c.key if c.is_object else c.index for c in self._stack)
+
+    def _finish_member(self, container: _Container, end: int):
+        """容器内的一个成员结束（遇到逗号或闭合括号）"""
+        start = container.value_start if container.is_object else container.start
+        if start is not None and len(self._stack) <= self.emit_depth:
+            text = self._slice(start, end).strip()
+            if text:
+                try:
+                    value = json.loads(text)
+                except ValueError:
+                    self.errors += 1
+                else:
+                    if self.on_value is not None:
+                        self.on_value(self._path(), value)
+        container.key = None
+        container.value_start = None
+        container.index += 1
+        container.start = end + 1
+
+    def feed(self, chunk: str) -> bool:
+        """输入一块文本，返回外层 JSON 是否已闭合（闭合后的输入被忽略）"""
+        if self.done or not chunk:
+            return self.done
+        base = self._length
+        self._offsets.append(base)
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+
+        for i, ch in enumerate(chunk):
+            pos = base + i
+            if self._root_start is None:
+                # 跳过 JSON 之前的说明文字与 ```json 标记
+                if ch in _OPENERS:
+                    self._root_start = pos
+                    self._stack.append(_Container(_OPENERS[ch], pos + 1))
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in _OPENERS:
+                self._stack.append(_Container(_OPENERS[ch], pos + 1))
+            elif ch == ",":
+                self._finish_member(self._stack[-1], pos)
+            elif ch == ":":
+                container = self._stack[-1]
+                if container.is_object and container.value_start is None:
+                    try:
+                        container.key = json.loads(self._slice(container.start, pos).strip())
+                    except ValueError:
+                        self.errors += 1
+                    container.value_start = pos + 1
+            elif ch in "}]":
+                container = self._stack[-1]
+                if ch != container.closer:
+                    self.errors += 1
+                self._finish_member(container, pos)
+                self._stack.pop()
+                if not self._stack:
+                    self.done = True
+                    try:
+                        self.value = json.loads(self._slice(self._root_start, pos + 1))
+                    except ValueError:
+                        self.errors += 1
+                    break
+        return self.done
@@ -0,0 +1,108 @@
+"""
+正文 token 预算 - 调用大语言模型前去除分享、版权、页脚等模板文字，再按导语优先的方式截取到 token 预算内，
+使每条新闻的提示词长度可控
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List
+
+from utils.news.tokens import count_tokens, truncate_tokens
+
+# 页脚标记：出现在正文末尾部分时截断其后全部内容（正文到此结束）；
+# 同样的文字常出现在文章开头（如 36氪 的 “本文来自微信公众号…，36氪经授权发布”），开头部分只按模板行去除
+FOOTER_MARKERS = [
+    "返回搜狐，查看更多", "责任编辑：", "责任编辑:", "免责声明", "特别声明：以上内容", "版权声明",
+    "转载请注明", "本文来自", "本文为转载", "（完）", "(完)",
+]
+# 页脚标记只在正文最后这一比例的部分内生效
+FOOTER_TAIL_RATIO = 0.3
+# 整行去除的模板文字（分享、来源、上下篇导航等）
+BOILERPLATE_LINE_PATTERNS = [
+    r'^分享(到|至)', r'^点击(查看|阅读|进入)',
+    r'^举报$', r'^原标题[:：]', r'^(图片|图)来源[:：]', r'^来源[:：]', r'^编辑[:：]', r'^审核[:：]',
+    r'^\s*(上一篇|下一篇|相关阅读|推荐阅读|热门推荐)',
+    r'^本文(来自|为转载|经授权)', r'经授权(发布|转载)', r'^(转载请注明|免责声明)',
+]
+# 扫码、关注、下载引导等文字也会出现在正文段落中（如 “患者扫码即可预约”），只在短行上整行去除
+BOILERPLATE_SHORT_LINE_PATTERNS = [
+    r'扫(一扫|码)', r'关注(公众号|我们)', r'(打开|下载)(APP|app|客户端)', r'阅读原文',
+]
+# 短行的最大字符数
+BOILERPLATE_SHORT_LINE_MAX = 30
+
+_FOOTER_PATTERN = re.compile("|".join(re.escape(marker) for marker in FOOTER_MARKERS))
+_BOILERPLATE_LINE = re.compile("|".join(BOILERPLATE_LINE_PATTERNS))
+_BOILERPLATE_SHORT_LINE = re.compile("|".join(BOILERPLATE_SHORT_LINE_PATTERNS))
+_SENTENCE_END = re.compile(r'[。！？!?；;]')
+
+
+@dataclass(frozen=True)
+class TrimmedContent:
+    """按预算截取后的正文与截取前后的 token 数"""
+    text: str
+    original_tokens: int
+    trimmed_tokens: int
+
+
+def _footer_start(content: str) -> int:
+    """正文末尾部分第一个页脚标记的位置，没有时返回 -1"""
+    tail_start = int(len(content) * (1 - FOOTER_TAIL_RATIO))
+    footer = _FOOTER_PATTERN.search(content, tail_start)
+    return footer.start() if footer else -1
+
+
+def strip_boilerplate(content: str) -> List[str]:
+    """去除末尾的页脚及其后内容、模板行与空行，返回段落列表"""
+    footer = _footer_start(content)
+    if footer >= 0:
+        content = content[:footer]
+    paragraphs = []
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or _BOILERPLATE_LINE.search(line):
+            continue
+        if len(line) < BOILERPLATE_SHORT_LINE_MAX and _BOILERPLATE_SHORT_LINE.search(line):
+            continue
+        paragraphs.append(line)
+    return paragraphs
+
+
+def _cut_at_sentence(text: str, budget: int) -> str:
+    """截取到 budget 个 token 以内，尽量在句末截断"""
+    head = truncate_tokens(text, budget)
+    ends = list(_SENTENCE_END.finditer(head))
+    # 句末位置过于靠前时（不足一半）直接按 token 截断，避免丢失太多内容
+    if ends and ends[-1].end() >= len(head) // 2:
+        return head[:ends[-1].end()]
+    return head
+
+
+@lru_cache(maxsize=256)
+def trim_content(content: str, budget: int) -> TrimmedContent:
+    """
+    按导语优先截取正文：去除模板文字后按段落顺序收录，直到下一段超出预算；
+    超出预算的那一段截取剩余预算的部分（尽量在句末截断）。budget <= 0 表示不限制
+    """
+    original_tokens = count_tokens(content)
+    if budget <= 0:
+        return TrimmedContent(content, original_tokens, original_tokens)
+    # 去除模板文字后为空时（页脚或模板规则误伤），退回未去除的正文
+    paragraphs = strip_boilerplate(content) or [line.strip() for line in content.splitlines() if line.strip()]
+    kept = []
+    used = 0
+    for paragraph in paragraphs:
+        # 段落间的换行按 1 个 token 计
+        tokens = count_tokens(paragraph) + (1 if kept else 0)
+        if used + tokens <= budget:
+            kept.append(paragraph)
+            used += tokens
+            continue
+        remaining = budget - used - (1 if kept else 0)
+        if remaining > 0:
+            head = _cut_at_sentence(paragraph, remaining)
+            if head:
+                kept.append(head)
+        break
+    text = "\n".join(kept)
+    return TrimmedContent(text, original_tokens, count_tokens(text))
@@ -0,0 +1,126 @@
+"""
+近似重复检测 - 基于字符 n-gram 的 MinHash-LSH 索引，识别标题/正文略有差异的转载新闻
+"""
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import xxhash
+
+NEAR_DUP_ENABLED = os.getenv("NEWS_NEAR_DUP_ENABLED", "1") == "1"
+# 字符 n-gram 的 Jaccard 相似度达到该阈值视为近似重复
+NEAR_DUP_THRESHOLD = float(os.getenv("NEWS_NEAR_DUP_THRESHOLD", "0.8"))
+# 字符 n-gram 长度（中文标题较短，3-gram 兼顾区分度与对改写的容忍）
+NEAR_DUP_NGRAM = int(os.getenv("NEWS_NEAR_DUP_NGRAM", "3"))
+# 与最近多少天内发送过的新闻标题比较
+NEAR_DUP_HISTORY_DAYS = int(os.getenv("NEWS_NEAR_DUP_HISTORY_DAYS", "30"))
+# 正文只取开头部分参与比较，转载稿的差异主要在标题与文末
+NEAR_DUP_CONTENT_CHARS = 500
+# 正文过短（缺失或只有占位内容）时不参与比较，避免大量条目因相同的短文本被误判
+NEAR_DUP_MIN_CONTENT_CHARS = 50
+
+# MinHash 签名长度与 LSH 分段：16 段 × 4 行，Jaccard 0.8 时成为候选的概率超过 99.9%
+NUM_PERM = 64
+LSH_BANDS = 16
+_ROWS = NUM_PERM // LSH_BANDS
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_rng = np.random.RandomState(20240601)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def shingles(text: str, n: int = NEAR_DUP_NGRAM) -> Set[int]:
+    """文本去除空白与标点后切分为字符 n-gram，返回其 64 位哈希集合"""
+    text = _NON_WORD.sub('', (text or '').lower())
+    if not text:
+        return set()
+    if len(text) <= n:
+        return {xxhash.xxh64_intdigest(text.encode('utf-8'))}
+    return {xxhash.xxh64_intdigest(text[i:i + n].encode('utf-8')) for i in range(len(text) - n + 1)}
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def minhash_signature(shingle_set: Set[int]) -> np.ndarray:
+    """计算 MinHash 签名（NUM_PERM 个 32 位哈希的最小值）"""
+    values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set)) & _MAX_HASH
+    hashed = (np.outer(values, _PERM_A) + _PERM_B) % _MERSENNE_PRIME & _MAX_HASH
+    return hashed.min(axis=0)
+
+
+class NearDuplicateIndex:
+    """
+    MinHash-LSH 近似重复索引
+
+    签名按段分桶，任一段完全相同的条目成为候选，再用 n-gram 集合的精确 Jaccard 相似度确认，
+    因此不会因哈希碰撞误判。
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD, ngram: int = NEAR_DUP_NGRAM):
+        self.threshold = threshold
+        self.ngram = ngram
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(LSH_BANDS)]
+        self._shingles: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * _ROWS:(i + 1) * _ROWS].tobytes() for i in range(LSH_BANDS)]
+
+    def _prepare(self, text: str) -> Tuple[Set[int], Optional[List[bytes]]]:
+        shingle_set = shingles(text, self.ngram)
+        if not shingle_set:
+            return shingle_set, None
+        return shingle_set, self._band_keys(minhash_signature(shingle_set))
+
+    def _find(self, shingle_set: Set[int], band_keys: List[bytes]) -> Optional[str]:
+        checked = set()
+        for bucket, band_key in zip(self._buckets, band_keys):
+            for key in bucket.get(band_key, ()):
+                if key in checked:
+                    continue
+                checked.add(key)
+                if jaccard(shingle_set, self._shingles[key]) >= self.threshold:
+                    return key
+        return None
+
+    def _insert(self, key: str, shingle_set: Set[int], band_keys: List[bytes]):
+        if key in self._shingles:
+            return
+        self._shingles[key] = shingle_set
+        for bucket, band_key in zip(self._buckets, band_keys):
+            bucket.setdefault(band_key, []).append(key)
+
+    def add(self, key: str, text: str):
+        shingle_set, band_keys = self._prepare(text)
+        if band_keys is not None:
+            self._insert(key, shingle_set, band_keys)
+
+    def add_many(self, items: Iterable[Tuple[str, str]]):
+        for key, text in items:
+            self.add(key, text)
+
+    def query(self, text: str) -> Optional[str]:
+        """返回与 text 近似重复的已索引条目键，没有则返回 None"""
+        shingle_set, band_keys = self._prepare(text)
+        if band_keys is None:
+            return None
+        return self._find(shingle_set, band_keys)
+
+
+def content_lead(content: str) -> str:
+    """参与正文比较的文本：正文的开头部分，正文过短时返回空字符串"""
+    content = (content or "").strip()
+    if len(content) < NEAR_DUP_MIN_CONTENT_CHARS:
+        return ""
+    return content[:NEAR_DUP_CONTENT_CHARS]
@@ -0,0 +1,190 @@
+"""
+流式新闻过滤管道 - 搜索结果到达即依次经过 转换 → 批次内去重 → 日期过滤 → 历史去重 → 近似重复过滤
+"""
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from graphs.state import NewsItem
+from utils.news.near_dup import NearDuplicateIndex, content_lead
+from utils.news.title_norm import normalize_title
+from utils.news.url_canon import canonicalize_url
+
+HISTORY_KEY_PREFIX = "history::"
+
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def build_near_dup_indexes(recent_history: Sequence[Tuple[str, str]] = ()) -> Tuple[NearDuplicateIndex, NearDuplicateIndex]:
+    """构建标题与正文近似重复索引，标题索引预先载入最近发送过的历史新闻 (url, title)"""
+    title_index = NearDuplicateIndex()
+    title_index.add_many((HISTORY_KEY_PREFIX + url, normalize_title(title)) for url, title in recent_history)
+    return title_index, NearDuplicateIndex()
+
+
+def find_near_duplicate(news: NewsItem, title_index: NearDuplicateIndex,
+                        content_index: NearDuplicateIndex) -> Optional[str]:
+    """
+    检查新闻是否与索引中的条目近似重复，返回重复条目的键（历史条目带 history:: 前缀）；
+    不重复时以URL为键加入两个索引
+    """
+    title_text = normalize_title(news.title)
+    lead = content_lead(news.content)
+    duplicate_of = title_index.query(title_text) or (content_index.query(lead) if lead else None)
+    if duplicate_of is None:
+        title_index.add(news.url, title_text)
+        if lead:
+            content_index.add(news.url, lead)
+    return duplicate_of
+
+
+def drop_near_duplicates(news_list: List[NewsItem], recent_history: Sequence[Tuple[str, str]] = ()
+                         ) -> Tuple[List[NewsItem], List[Tuple[NewsItem, str]]]:
+    """按顺序过滤近似重复的新闻，返回 (保留的新闻, [(被过滤的新闻, 重复条目的键)])"""
+    title_index, content_index = build_near_dup_indexes(recent_history)
+    kept, dropped = [], []
+    for news in news_list:
+        duplicate_of = find_near_duplicate(news, title_index, content_index)
+        if duplicate_of is None:
+            kept.append(news)
+        else:
+            dropped.append((news, duplicate_of))
+    return kept, dropped
+
+
+def to_news_item(item: Any, today: datetime) -> NewsItem:
+    """将搜索结果项转换为NewsItem（URL规范化），PublishTime为空时使用当前日期"""
+    publish_date = today.strftime('%Y-%m-%d')
+    if item.PublishTime:
+        try:
+            publish_date = item.PublishTime.split('T')[0]
+        except Exception:
+            pass
+    return NewsItem(
+        title=item.Title or "",
+        date=publish_date,
+        url=canonicalize_url(item.Url),
+        original_url=item.Url,
+        summary=item.Snippet or "",
+        content=item.Content or "",
+        keywords=[]
+    )
+
+
+class NewsStreamFilter:
+    """
+    逐条处理搜索结果的过滤器
+
+    批次内去重集合在每轮搜索开始时重置（start_round），
+    已接收新闻的URL/标题集合跨轮保留，等价于与累积列表去重。
+    按结果到达顺序逐条处理，结果与先收集后分阶段全量处理一致。
+    因与已接收新闻重复而被过滤的条目记录在 accepted_hits 中（每次 feed 重置），
+    多专题共用搜索时据此把已接收的新闻同时划入当前查询的专题。
+    历史去重按查询批量进行：一个查询的候选通过 history.existing() 一次确认（见 HistoryLookup）。
+    """
+
+    def __init__(self, today: datetime, cutoff_date_str: str, history: Optional[Any] = None,
+                 near_dup: bool = False, recent_history: Sequence[Tuple[str, str]] = ()):
+        self.today = today
+        self.cutoff_date_str = cutoff_date_str
+        self.history = history
+        self.accepted_urls: Set[str] = set()
+        self.accepted_titles: Set[str] = set()
+        # URL/标准化标题 -> 已接收新闻的URL
+        self._accepted_keys: Dict[str, str] = {}
+        self.accepted_hits: List[str] = []
+        # 近似重复索引（跨轮保留）：标题与最近发送过的历史标题比较，正文只在本次运行内比较
+        self.near_dup = near_dup
+        self.title_index: Optional[NearDuplicateIndex] = None
+        self.content_index: Optional[NearDuplicateIndex] = None
+        if near_dup:
+            self.title_index, self.content_index = build_near_dup_indexes(recent_history)
+        self.start_round()
+
+    def start_round(self):
+        """开始新一轮搜索：重置批次内去重集合与统计"""
+        self.seen_urls: Set[str] = set()
+        self.seen_titles: Set[str] = set()
+        self.stats = {
+            "raw": 0,
+            "converted": 0,
+            "batch_unique": 0,
+            "date_kept": 0,
+            "date_invalid": 0,
+            "date_old": 0,
+            "history_duplicates": 0,
+            "near_duplicates": 0,
+            "survivors": 0,
+        }
+
+    def feed(self, web_items: Iterable[Any]) -> Iterator[NewsItem]:
+        """处理一个查询返回的结果，产出通过全部过滤的新闻"""
+        self.accepted_hits = []
+        candidates = []
+        for item in web_items:
+            self.stats["raw"] += 1
+            if not item.Url:
+                continue
+            news = to_news_item(item, self.today)
+            self.stats["converted"] += 1
+
+            # 批次内去重（URL和标准化标题）
+            normalized_title = normalize_title(news.title)
+            if news.url in self.seen_urls:
+                self._note_accepted_hit(news.url, normalized_title)
+                continue
+            self.seen_urls.add(news.url)
+            if normalized_title in self.seen_titles:
+                self._note_accepted_hit(news.url, normalized_title)
+                continue
+            self.seen_titles.add(normalized_title)
+            self.stats["batch_unique"] += 1
+
+            # 日期过滤（近3个月）
+            news_date = news.date if news.date else self.today.strftime('%Y-%m-%d')
+            if not DATE_PATTERN.match(news_date):
+                self.stats["date_invalid"] += 1
+                continue
+            if news_date < self.cutoff_date_str:
+                self.stats["date_old"] += 1
+                continue
+            self.stats["date_kept"] += 1
+            candidates.append((news, normalized_title, item.Url, item.Title or ""))
+
+        # 本查询的候选一次确认是否已在历史记录中；历史记录中较早的行保存的是原始URL/标题，一并确认
+        history_urls, history_titles = set(), set()
+        if self.history is not None and candidates:
+            history_urls, history_titles = self.history.existing(
+                [url for news, _, raw_url, _ in candidates for url in (news.url, raw_url)],
+                [title for _, normalized_title, _, raw_title in candidates for title in (normalized_title, raw_title)]
+            )
+
+        for news, normalized_title, raw_url, raw_title in candidates:
+            # 历史记录与累积列表去重（标题按标准形式比较）
+            if (news.url in history_urls or raw_url in history_urls
+                    or normalized_title in history_titles or raw_title in history_titles
+                    or news.url in self.accepted_urls or normalized_title in self.accepted_titles):
+                self.stats["history_duplicates"] += 1
+                self._note_accepted_hit(news.url, normalized_title)
+                continue
+
+            # 近似重复（转载稿标题/正文略有差异）
+            if self.near_dup:
+                duplicate_of = find_near_duplicate(news, self.title_index, self.content_index)
+                if duplicate_of is not None:
+                    self.stats["near_duplicates"] += 1
+                    if not duplicate_of.startswith(HISTORY_KEY_PREFIX) and duplicate_of not in self.accepted_hits:
+                        self.accepted_hits.append(duplicate_of)
+                    continue
+
+            self.accepted_urls.add(news.url)
+            self.accepted_titles.add(normalized_title)
+            self._accepted_keys.setdefault(news.url, news.url)
+            self._accepted_keys.setdefault(normalized_title, news.url)
+            self.stats["survivors"] += 1
+            yield news
+
+    def _note_accepted_hit(self, url: str, normalized_title: str):
+        accepted_url = self._accepted_keys.get(url) or self._accepted_keys.get(normalized_title)
+        if accepted_url and accepted_url not in self.accepted_hits:
+            self.accepted_hits.append(accepted_url)
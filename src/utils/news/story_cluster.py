@@ -0,0 +1,175 @@
+"""
+事件聚类 - 标题与摘要的字符 n-gram TF-IDF 向量按余弦相似度聚类，
+同一事件（如同一轮融资、同一产品获批）的多家媒体报道归为一组，只保留一条代表新闻，其余作为备选来源；
+短标题的字符相似度对不同主体的同类新闻（如两家公司各自融资）同样很高，合并前还要求主体与数字一致
+"""
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Tuple
+
+import numpy as np
+
+from graphs.state import NewsItem
+from utils.news.title_norm import normalize_title
+
+STORY_CLUSTER_ENABLED = os.getenv("NEWS_STORY_CLUSTER_ENABLED", "1") == "1"
+# 与事件首条新闻的余弦相似度达到该阈值、且事件要素一致（same_story_keys）视为同一事件
+# （不同媒体改写同一事件的标题通常在 0.35 以上；不同事件的同类新闻相似度同样可能很高，由事件要素区分）
+STORY_CLUSTER_THRESHOLD = float(os.getenv("NEWS_STORY_CLUSTER_THRESHOLD", "0.35"))
+# 字符 n-gram 长度（中文词多为两字，2-gram 对不同媒体的改写标题更稳定）
+STORY_CLUSTER_NGRAM = int(os.getenv("NEWS_STORY_CLUSTER_NGRAM", "2"))
+# 摘要/正文只取开头部分，事件的主体、金额、产品等要素集中在导语
+STORY_CLUSTER_SNIPPET_CHARS = 200
+# 事件动作词：标准化标题中第一个动作词之前的部分视为事件主体（公司、机构或产品）
+STORY_ACTION_WORDS = [
+    "完成", "获得", "获批", "获", "宣布", "发布", "推出", "亮相", "上市", "批准", "通过", "启动", "签约", "签署",
+    "收购", "并购", "中标", "入选", "融资", "登陆", "递表", "拟",
+]
+# 行业通用的两字词，不能作为主体一致的依据（如 “迈瑞医疗” 与 “联影医疗” 只共有 “医疗”）
+STORY_GENERIC_GRAMS = frozenset({
+    "医疗", "器械", "医美", "生物", "科技", "集团", "公司", "股份", "控股", "药业", "医药", "健康", "技术", "产品",
+    "设备", "国际", "中国", "美容", "诊断", "新款", "旗下", "全球", "国内", "企业",
+})
+# 主体缺少动作词时取标题开头的字符数
+STORY_SUBJECT_CHARS = 6
+
+_ACTION_PATTERN = re.compile("|".join(sorted(STORY_ACTION_WORDS, key=len, reverse=True)))
+_NUMBER_PATTERN = re.compile(r'\d+')
+_LATIN_PATTERN = re.compile(r'[a-z][a-z0-9]+')
+
+
+def story_text(news: NewsItem) -> Tuple[str, str]:
+    """参与聚类的文本：(标准化标题, 标准化后的摘要或正文开头)"""
+    snippet = (news.summary or news.content)[:STORY_CLUSTER_SNIPPET_CHARS]
+    return normalize_title(news.title), normalize_title(snippet) if snippet.strip() else ""
+
+
+def _ngrams(text: str, n: int) -> List[str]:
+    if len(text) <= n:
+        return [text] if text else []
+    return [text[i:i + n] for i in range(len(text) - n + 1)]
+
+
+def tfidf_matrix(texts: List[str], ngram: int = STORY_CLUSTER_NGRAM) -> np.ndarray:
+    """
+    字符 n-gram TF-IDF 矩阵（每行 L2 归一化，行向量点积即余弦相似度）
+    词频取 1 + log(tf)，逆文档频率取平滑的 log((1 + N) / (1 + df)) + 1
+    """
+    vocab: Dict[str, int] = {}
+    rows = []
+    for text in texts:
+        counts: Dict[int, int] = {}
+        for gram in _ngrams(text, ngram):
+            col = vocab.setdefault(gram, len(vocab))
+            counts[col] = counts.get(col, 0) + 1
+        rows.append(counts)
+
+    matrix = np.zeros((len(texts), len(vocab)), dtype=np.float32)
+    for i, counts in enumerate(rows):
+        if counts:
+            cols = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            matrix[i, cols] = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    nonzero = matrix > 0
+    matrix[nonzero] = 1 + np.log(matrix[nonzero])
+    df = nonzero.sum(axis=0)
+    matrix *= np.log((1 + len(texts)) / (1 + df)) + 1
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def story_similarity(news_list: List[NewsItem]) -> np.ndarray:
+    """新闻两两之间的事件相似度：标题向量与摘要向量的余弦相似度取平均（缺少摘要时只用标题）"""
+    texts = [story_text(news) for news in news_list]
+    titles = tfidf_matrix([title for title, _ in texts])
+    snippets = tfidf_matrix([snippet for _, snippet in texts])
+    title_sim = titles @ titles.T
+    snippet_sim = snippets @ snippets.T
+    has_snippet = np.array([bool(snippet) for _, snippet in texts])
+    both = np.outer(has_snippet, has_snippet)
+    return np.where(both, (title_sim + snippet_sim) / 2, title_sim)
+
+
+@dataclass(frozen=True)
+class StoryKeys:
+    """标题中区分事件的要素：数字（金额、数量、轮次）、英文词（产品型号、机构缩写）、主体与全部标题的 2-gram"""
+    numbers: FrozenSet[str]
+    latin: FrozenSet[str]
+    subject: FrozenSet[str]
+    grams: FrozenSet[str]
+
+
+def story_keys(news: NewsItem) -> StoryKeys:
+    title = normalize_title(news.title)
+    action = _ACTION_PATTERN.search(title)
+    subject = title[:action.start()] if action and action.start() > 0 else title[:STORY_SUBJECT_CHARS]
+    return StoryKeys(
+        numbers=frozenset(_NUMBER_PATTERN.findall(title)),
+        latin=frozenset(_LATIN_PATTERN.findall(title)),
+        subject=frozenset(_ngrams(subject, 2)) - STORY_GENERIC_GRAMS,
+        grams=frozenset(_ngrams(title, 2)),
+    )
+
+
+def same_story_keys(a: StoryKeys, b: StoryKeys) -> bool:
+    """
+    两条新闻的事件要素是否一致：
+    - 都含数字时至少有一个相同（“批准3款” 与 “批准5款” 不是同一事件）
+    - 都含英文词时至少有一个相同（“CT” 与 “MRI” 不是同一产品）
+    - 一条新闻的主体（去除行业通用词）出现在另一条的标题中
+    """
+    if a.numbers and b.numbers and not a.numbers & b.numbers:
+        return False
+    if a.latin and b.latin and not a.latin & b.latin:
+        return False
+    return bool(a.subject & b.grams or b.subject & a.grams)
+
+
+def cluster_stories(news_list: List[NewsItem], threshold: float = STORY_CLUSTER_THRESHOLD) -> List[List[int]]:
+    """
+    按接收顺序聚类，返回各事件的新闻下标列表（每组第一个为最早接收的新闻）
+    每条新闻归入与其首条新闻相似度最高、达到阈值且事件要素一致的事件，否则自成一个事件；
+    只与首条新闻比较，避免相似度逐条传递把不同事件串成一组
+    """
+    if not news_list:
+        return []
+    similarity = story_similarity(news_list)
+    keys = [story_keys(news) for news in news_list]
+    clusters: List[List[int]] = []
+    for i in range(len(news_list)):
+        best, best_sim = None, threshold
+        for cluster in clusters:
+            if not same_story_keys(keys[i], keys[cluster[0]]):
+                continue
+            sim = similarity[i, cluster[0]]
+            if sim >= best_sim:
+                best, best_sim = cluster, sim
+        if best is None:
+            clusters.append([i])
+        else:
+            best.append(i)
+    return clusters
+
+
+def collapse_stories(news_list: List[NewsItem], threshold: float = STORY_CLUSTER_THRESHOLD) -> Tuple[List[NewsItem], Dict[str, str]]:
+    """
+    每个事件只保留一条代表新闻：正文最长的一条（摘要生成质量最好），位置取该事件首条新闻的位置，
+    其余新闻的链接记入代表新闻的 alternate_urls
+    返回 (代表新闻列表, 被合并新闻URL -> 代表新闻URL)
+    """
+    representatives = []
+    merged: Dict[str, str] = {}
+    for cluster in cluster_stories(news_list, threshold):
+        members = [news_list[i] for i in cluster]
+        representative = max(members, key=lambda news: len(news.content))
+        for news in members:
+            if news is representative:
+                continue
+            merged[news.url] = representative.url
+            # 备选来源用于展示，记录原始链接
+            for url in [news.original_url or news.url] + news.alternate_urls:
+                if url not in representative.alternate_urls:
+                    representative.alternate_urls.append(url)
+        representatives.append(representative)
+    return representatives, merged
@@ -0,0 +1,52 @@
+"""
+中文新闻标题标准化 - 全角/半角折叠、站点后缀去除、标点与空白去除，一次预编译正则完成，
+所有比较或保存标题（批次去重、历史去重、近似重复检测）都使用同一标准形式
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List
+
+# 各站点转载/分享时附加在标题末尾的站点名
+SITE_TITLE_SUFFIXES: Dict[str, List[str]] = {
+    "toutiao": ["今日头条", "头条号", "头条", "toutiao"],
+    "sohu": ["搜狐新闻", "搜狐网", "搜狐号", "搜狐"],
+    "qq": ["腾讯新闻", "腾讯网", "腾讯"],
+    "163": ["网易新闻", "网易号", "网易"],
+    "ifeng": ["凤凰网资讯", "凤凰网财经", "凤凰网", "凤凰新闻"],
+    "sina": ["新浪财经", "新浪新闻", "新浪科技", "新浪医药", "新浪网", "新浪"],
+    "thepaper": ["澎湃新闻", "澎湃号", "澎湃"],
+    "36kr": ["36氪"],
+    "ylqx": ["环球医疗器械网"],
+    "generic": ["新闻", "资讯", "财经", "手机版"],
+}
+
+# 标题与站点名之间的分隔符（全角已折叠为半角）
+_SEPARATORS = r'[|_\-–—:·丨/]'
+
+
+def _build_suffix_pattern() -> re.Pattern:
+    names = sorted({name for names in SITE_TITLE_SUFFIXES.values() for name in names}, key=len, reverse=True)
+    alternatives = "|".join(re.escape(name.lower()) for name in names)
+    # 可连续出现多个站点后缀，如 “标题_新浪财经_新浪网”
+    return re.compile(rf'(?:\s*{_SEPARATORS}+\s*(?:{alternatives})\s*)+$')
+
+
+_SUFFIX_PATTERN = _build_suffix_pattern()
+# 标点、符号与空白（简体的 “” ‘’ 与繁体习惯的 「」『』 等一并去除）
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+@lru_cache(maxsize=8192)
+def normalize_title(title: str) -> str:
+    """
+    标准化标题：
+    1. NFKC 折叠全角字母、数字与标点为半角，转小写
+    2. 去除末尾的站点名后缀（如 “_新浪财经”、“- 今日头条”、“| toutiao”）
+    3. 去除全部标点、符号与空白
+    去除后为空时（标题只有站点名或标点）退回第1步的结果去除空白
+    """
+    folded = unicodedata.normalize("NFKC", title or "").lower().strip()
+    stripped = _SUFFIX_PATTERN.sub("", folded)
+    normalized = _NON_WORD.sub("", stripped)
+    return normalized or _NON_WORD.sub("", folded) or folded
@@ -0,0 +1,69 @@
+"""
+Token 计数 - 使用 tiktoken 编码计数，用于按 token 预算组织大语言模型请求；
+编码文件无法加载（如离线环境首次使用）时按字符估算
+"""
+import os
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+TOKEN_ENCODING = os.getenv("ENRICH_TOKEN_ENCODING", "cl100k_base")
+
+_encoding = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+
+
+def get_encoding() -> Optional[object]:
+    """获取进程级共享的 tiktoken 编码（懒加载），加载失败时返回 None 且不再重试"""
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        with _encoding_lock:
+            if _encoding is None and not _encoding_failed:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+                except Exception as e:
+                    logger.warning(f"tiktoken encoding {TOKEN_ENCODING} unavailable, estimating tokens by characters: {e}")
+                    _encoding_failed = True
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """按字符估算 token 数：中日韩字符约 1 个 token，其余字符约 4 个一个 token"""
+    cjk = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, budget: int) -> str:
+    """截取 text 开头不超过 budget 个 token 的部分"""
+    if budget <= 0 or not text:
+        return ""
+    encoding = get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= budget:
+            return text
+        # 截断处可能落在多字节字符中间，去除解码出的替换字符
+        return encoding.decode(tokens[:budget]).rstrip("�")
+    # 与 estimate_tokens 相同的估算方式，逐字符累计到超出预算为止
+    cjk = other = 0
+    for i, ch in enumerate(text):
+        if ord(ch) >= 0x2E80:
+            cjk += 1
+        else:
+            other += 1
+        if cjk + (other + 3) // 4 > budget:
+            return text[:i]
+    return text
@@ -0,0 +1,132 @@
+"""
+URL 规范化 - 统一协议、主机、路径与查询参数，同一篇新闻的不同链接形式（移动版、带追踪参数等）得到同一个URL，
+只用作批次去重与历史记录的键；发给读者的仍是原始链接
+"""
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Pattern, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# 通用的追踪/分享参数，所有站点都移除
+TRACKING_PARAMS = frozenset({
+    "spm", "scm", "from", "share_token", "share_from", "sharer", "shareid", "tt_from", "isappinstalled",
+    "wxshare_count", "_wv", "_f", "fr", "refer",
+})
+_TRACKING_PREFIXES = ("utm_", "share_", "_trans_")
+_DUPLICATE_SLASHES = re.compile(r'/{2,}')
+
+
+@dataclass
+class HostRule:
+    """
+    单个站点的规范化规则
+
+    hosts: 属于该站点的主机名（含移动版），统一改写为 canonical_host
+    paths: (路径正则, 改写模板) 列表，按顺序匹配，第一个匹配的生效，模板中的 {0}、{1} 为正则分组
+    keep_params: 路径匹配文章ID规则时需要保留的查询参数（其余全部移除，文章ID已在路径中）；
+                 路径未匹配任何规则时参数可能标识内容（如 /picture/123?id=5），只移除追踪参数
+    """
+    canonical_host: str
+    hosts: Tuple[str, ...]
+    paths: List[Tuple[Pattern, str]] = field(default_factory=list)
+    keep_params: Optional[FrozenSet[str]] = frozenset()
+
+
+def _paths(*pairs: Tuple[str, str]) -> List[Tuple[Pattern, str]]:
+    return [(re.compile(pattern), template) for pattern, template in pairs]
+
+
+# 搜索计划中各站点的规则；文章ID相同的链接改写为同一个桌面版地址
+HOST_RULES: List[HostRule] = [
+    HostRule("www.toutiao.com", ("toutiao.com", "www.toutiao.com", "m.toutiao.com"), _paths(
+        (r'^/(?:i|a|group/|article/)(\d+)/?$', "/article/{0}/"),
+    )),
+    HostRule("www.sohu.com", ("sohu.com", "www.sohu.com", "m.sohu.com"), _paths(
+        (r'^/a/(\d+_\d+)/?$', "/a/{0}"),
+    )),
+    HostRule("new.qq.com", ("new.qq.com", "news.qq.com", "view.inews.qq.com", "xw.qq.com"), _paths(
+        (r'^/(?:rain/a|omn(?:/\d+)?|a|cmsid)/([A-Za-z0-9]+?)(?:\.html)?/?$', "/rain/a/{0}"),
+    )),
+    HostRule("www.163.com", ("www.163.com", "m.163.com", "3g.163.com", "c.m.163.com"), _paths(
+        (r'^/[a-z]+/(?:article|a)/([A-Z0-9]+)\.html$', "/dy/article/{0}.html"),
+    )),
+    HostRule("news.ifeng.com", ("news.ifeng.com", "i.ifeng.com", "ishare.ifeng.com", "m.ifeng.com"), _paths(
+        (r'^/c/(?:s/)?([A-Za-z0-9]+)/?$', "/c/{0}"),
+    )),
+    # 新浪移动版与桌面版的文章路径不一一对应，只统一协议与参数
+    HostRule("finance.sina.com.cn", ("finance.sina.com.cn",)),
+    HostRule("news.sina.com.cn", ("news.sina.com.cn",)),
+    HostRule("finance.sina.cn", ("finance.sina.cn",)),
+    HostRule("news.sina.cn", ("news.sina.cn",)),
+    HostRule("www.thepaper.cn", ("thepaper.cn", "www.thepaper.cn", "m.thepaper.cn"), _paths(
+        (r'^/(?:newsDetail_forward_|detail/)(\d+)/?$', "/newsDetail_forward_{0}"),
+    )),
+    HostRule("36kr.com", ("36kr.com", "www.36kr.com", "m.36kr.com"), _paths(
+        (r'^/p/(\d+)/?$', "/p/{0}"),
+    )),
+]
+
+_RULES_BY_HOST: Dict[str, HostRule] = {host: rule for rule in HOST_RULES for host in rule.hosts}
+
+
+def _clean_query(query: str, keep_params: Optional[FrozenSet[str]]) -> str:
+    if not query:
+        return ""
+    params = []
+    for key, value in parse_qsl(query, keep_blank_values=True):
+        lowered = key.lower()
+        if keep_params is not None:
+            if lowered in keep_params:
+                params.append((key, value))
+        elif lowered not in TRACKING_PARAMS and not lowered.startswith(_TRACKING_PREFIXES):
+            params.append((key, value))
+    return urlencode(sorted(params))
+
+
+@lru_cache(maxsize=8192)
+def canonicalize_url(url: str) -> str:
+    """
+    规范化新闻URL：
+    - 去除片段（#...）、通用追踪参数，剩余参数排序
+    - 主机名小写，去除默认端口
+    - 已知站点：统一为 https 与桌面版主机名，按文章ID改写路径并只保留必要参数；未匹配文章ID规则的路径只移除追踪参数
+    - 路径合并重复斜杠、去除末尾斜杠（站点规则指定的形式除外）
+    无法解析的URL原样返回（去除首尾空白）
+    """
+    url = (url or "").strip()
+    if not url:
+        return url
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return url
+
+    scheme = parts.scheme
+    host = parts.hostname.lower().rstrip(".")
+    port = port if port not in (None, 80, 443) else None
+    path = _DUPLICATE_SLASHES.sub("/", parts.path or "/")
+
+    rule = _RULES_BY_HOST.get(host)
+    if rule is not None:
+        scheme = "https"
+        host = rule.canonical_host
+        port = None
+        for pattern, template in rule.paths:
+            match = pattern.match(path)
+            if match:
+                path = template.format(*match.groups())
+                query = _clean_query(parts.query, rule.keep_params)
+                break
+        else:
+            path = path.rstrip("/") or "/"
+            query = _clean_query(parts.query, None)
+    else:
+        path = path.rstrip("/") or "/"
+        query = _clean_query(parts.query, None)
+
+    netloc = f"{host}:{port}" if port else host
+    return urlunsplit((scheme, netloc, path, query, ""))